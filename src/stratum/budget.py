@@ -18,9 +18,11 @@ class Budget:
     ms: int | None = None       # wall-clock milliseconds
     usd: float | None = None    # cost ceiling in USD
 
-    # Runtime tracking — not part of the public API, not shown in repr
-    _start_ms: float = field(
-        default_factory=lambda: time.monotonic() * 1000,
+    # Runtime tracking — not part of the public API, not shown in repr.
+    # The ms window is stored as an absolute time.monotonic() deadline fixed at
+    # construction, so each check is one clock read and one compare.
+    _deadline: float | None = field(
+        default=None,
         init=False,
         repr=False,
         compare=False,
@@ -32,16 +34,22 @@ class Budget:
         compare=False,
     )
 
+    def __post_init__(self) -> None:
+        if self.ms is not None:
+            self._deadline = time.monotonic() + self.ms / 1000.0
+
     def remaining_seconds(self) -> float | None:
         """
         Return remaining wall-clock time in seconds, or None if no ms limit.
         Returns 0.0 if the budget is already exhausted.
         """
-        if self.ms is None:
+        if self._deadline is None:
             return None
-        elapsed_ms = (time.monotonic() * 1000) - self._start_ms
-        remaining_ms = self.ms - elapsed_ms
-        return max(0.0, remaining_ms / 1000.0)
+        return max(0.0, self._deadline - time.monotonic())
+
+    def is_expired(self) -> bool:
+        """Return True if the wall-clock deadline has passed. Always False with no ms limit."""
+        return self._deadline is not None and time.monotonic() >= self._deadline
 
     def record_cost(self, usd: float) -> None:
         """Accumulate a cost charge against this budget."""
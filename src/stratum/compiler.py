@@ -21,6 +21,28 @@ def _format_value(value: Any) -> str:
     return str(value)
 
 
+def _check_opaque_inline(
+    intent: str,
+    context: list[str],
+    opaque_fields: set[str],
+) -> None:
+    """
+    Spec §4.2: raise StratumCompileError if an opaque field is referenced
+    inline in intent or context strings.
+    """
+    if not opaque_fields:
+        return
+    from .exceptions import StratumCompileError
+    for text in [intent, *context]:
+        for field_name in opaque_fields:
+            if f"{{{field_name}}}" in text:
+                raise StratumCompileError(
+                    f"opaque field '{field_name}' must not appear in inline "
+                    "string interpolation (intent or context). "
+                    "Opaque fields are passed as structured attachments only."
+                )
+
+
 def compile_prompt(
     intent: str,
     context: list[str],
@@ -44,18 +66,26 @@ def compile_prompt(
     Spec §4.2: raises StratumCompileError if an opaque field name appears as
     an inline {field} reference in intent or context strings.
     """
-    # Spec §4.2: raise StratumCompileError if an opaque field is referenced
-    # inline in intent or context strings.
-    if opaque_fields:
-        from .exceptions import StratumCompileError
-        for text in [intent, *context]:
-            for field_name in opaque_fields:
-                if f"{{{field_name}}}" in text:
-                    raise StratumCompileError(
-                        f"opaque field '{field_name}' must not appear in inline "
-                        "string interpolation (intent or context). "
-                        "Opaque fields are passed as structured attachments only."
-                    )
+    head, tail = compile_prompt_parts(intent, context, inputs, opaque_fields)
+    return assemble_prompt(head, retry_reasons, tail)
+
+
+def compile_prompt_parts(
+    intent: str,
+    context: list[str],
+    inputs: dict[str, Any],
+    opaque_fields: set[str],
+) -> tuple[str, str]:
+    """
+    Return the (head, tail) of the compiled prompt either side of the retry block.
+
+    head is steps 1–3 of compile_prompt (intent, context, non-opaque inputs);
+    tail is step 5 (opaque data reference), or "" when there are no opaque
+    fields. Neither depends on retry_reasons, so the executor builds them once
+    per call and splices in the retry block per attempt via assemble_prompt().
+    """
+    _check_opaque_inline(intent, context, opaque_fields)
+
     parts: list[str] = []
 
     # 1. Intent
@@ -73,6 +103,19 @@ def compile_prompt(
         for key, value in non_opaque.items():
             parts.append(f"  {key}: {_format_value(value)}")
 
+    # 5. Opaque field reference
+    tail = ""
+    if opaque_fields:
+        names = ", ".join(sorted(opaque_fields))
+        tail = f"See attached data for: {names}"
+
+    return "\n".join(parts), tail
+
+
+def assemble_prompt(head: str, retry_reasons: list[str], tail: str) -> str:
+    """Join a compile_prompt_parts() head and tail around the retry block (step 4)."""
+    parts = [head]
+
     # 4. Retry context — only on retries (attempt > 0)
     if retry_reasons:
         parts.append("Previous attempt failed:")
@@ -80,10 +123,8 @@ def compile_prompt(
             parts.append(f"  - {reason}")
         parts.append("Fix these issues specifically.")
 
-    # 5. Opaque field reference
-    if opaque_fields:
-        names = ", ".join(sorted(opaque_fields))
-        parts.append(f"See attached data for: {names}")
+    if tail:
+        parts.append(tail)
 
     return "\n".join(parts)
 
@@ -99,16 +140,7 @@ def compile_prompt_stable(
     Runs the opaque-field inline-reference check (spec §4.2).
     Used by the executor to build Anthropic prompt-cache content blocks.
     """
-    if opaque_fields:
-        from .exceptions import StratumCompileError
-        for text in [intent, *context]:
-            for field_name in opaque_fields:
-                if f"{{{field_name}}}" in text:
-                    raise StratumCompileError(
-                        f"opaque field '{field_name}' must not appear in inline "
-                        "string interpolation (intent or context). "
-                        "Opaque fields are passed as structured attachments only."
-                    )
+    _check_opaque_inline(intent, context, opaque_fields)
     parts = [intent]
     for ctx in context:
         if ctx:
@@ -20,7 +20,9 @@ async def parallel(
     require="all"  → all must succeed; any failure cancels rest and re-raises.
                      Returns a tuple matching input order.
     require="any"  → first success wins, rest cancelled. Returns single result.
-    require=N: int → at least N must succeed. Returns list of N results.
+    require=N: int → at least N must succeed. Returns the first N to succeed,
+                     sorted by input position; the rest are cancelled once N
+                     succeed or N becomes unreachable, or if parallel is cancelled.
     require=0      → collect all regardless of failure. Returns list[Success|Failure].
 
     validate       → optional callable on collected results; False → ParallelValidationFailed.
@@ -89,19 +91,46 @@ async def parallel(
         return results
 
     if isinstance(require, int) and require > 0:
-        # At least require many must succeed
-        all_results = await asyncio.gather(*coros, return_exceptions=True)
-        successes = [r for r in all_results if not isinstance(r, Exception)]
-        failures = [r for r in all_results if isinstance(r, Exception)]
+        # At least require many must succeed. Stop as soon as that is met, or
+        # can no longer be met, and cancel whatever is still running.
+        tasks = [asyncio.create_task(c) for c in coros]
+        index = {t: i for i, t in enumerate(tasks)}
+        pending: set = set(tasks)
+        successes: list[tuple[int, Any]] = []
+        failures: list[tuple[int, BaseException]] = []
+
+        try:
+            while pending and len(successes) < require <= len(successes) + len(pending):
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for d in done:
+                    if d.cancelled():
+                        continue
+                    exc = d.exception()
+                    if exc is None:
+                        successes.append((index[d], d.result()))
+                    else:
+                        failures.append((index[d], exc))
+        finally:
+            # Also runs when parallel itself is cancelled, so children never outlive it
+            for p in pending:
+                p.cancel()
+            for p in pending:
+                try:
+                    await p
+                except (asyncio.CancelledError, Exception):
+                    pass
 
         if len(successes) < require:
             if failures:
-                raise failures[0]
+                raise min(failures, key=lambda f: f[0])[1]
             raise RuntimeError(
                 f"parallel: needed {require} successes, got {len(successes)}"
             )
 
-        results = successes[:require]
+        # The first require successes to finish, reported in input order.
+        results = [r for _, r in sorted(successes, key=lambda s: s[0])[:require]]
         if validate is not None and not validate(results):
             raise ParallelValidationFailed()
         return results
@@ -7,7 +7,7 @@ import contextvars
 import dataclasses
 import functools
 import inspect
-import uuid
+import secrets
 from typing import Any, Callable, get_type_hints
 
 from .budget import Budget
@@ -154,7 +154,16 @@ async def _execute_quorum(
     flow_budget: Budget | None,
     flow_id: str | None,
 ) -> Any:
-    """Run spec.quorum parallel calls and check agreement on spec.agree_on."""
+    """
+    Run spec.quorum parallel calls and check agreement on spec.agree_on.
+
+    All N calls are scheduled before any is awaited, so wall-clock latency is
+    one call, not N. gather(return_exceptions=True) is used rather than a
+    TaskGroup: a failed sample must not cancel its siblings, since the
+    remaining samples may still reach the threshold.
+    """
+    from collections import Counter
+
     from .exceptions import ConsensusFailure
 
     n = spec.quorum
@@ -181,19 +190,15 @@ async def _execute_quorum(
             return obj.get(name)
         return obj
 
-    from collections import Counter
-
-    field_values = [_get_field(o, field_name) for o in successes]
-    counts: Counter = Counter(str(v) for v in field_values)
-    modal_str, modal_count = counts.most_common(1)[0]
+    # Agreement key computed once per sample, reused for grouping and selection
+    keys = [str(_get_field(o, field_name)) for o in successes]
+    modal_str, modal_count = Counter(keys).most_common(1)[0]
 
     if modal_count < threshold_n:
         raise ConsensusFailure(spec.fn.__name__, n, threshold_n, list(all_outputs))
 
     # Return the agreeing result with highest confidence (if available), else first
-    agreers = [
-        o for o in successes if str(_get_field(o, field_name)) == modal_str
-    ]
+    agreers = [o for o, k in zip(successes, keys) if k == modal_str]
     best = agreers[0]
     if hasattr(best, "confidence"):
         best = max(agreers, key=lambda o: getattr(o, "confidence", 0))
@@ -280,7 +285,7 @@ def flow(budget: Budget | None = None) -> Callable:
     def decorator(fn: Callable) -> Callable:
         @functools.wraps(fn)
         async def wrapper(*args: Any, **kwargs: Any) -> Any:
-            flow_id = str(uuid.uuid4())
+            flow_id = secrets.token_hex(16)
             flow_budget = budget.clone() if budget is not None else None
             ctx = _FlowContext(flow_id=flow_id, budget=flow_budget)
             token = _flow_ctx.set(ctx)
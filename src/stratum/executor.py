@@ -3,16 +3,23 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import hashlib
 import json
 import time
 from dataclasses import dataclass, field
-from typing import Any, Callable, get_type_hints
+from typing import Any, Callable, Sequence, get_type_hints
 
 import litellm
 
 from ._config import get_config
 from .budget import Budget
-from .compiler import build_opaque_attachment, compile_prompt, prompt_hash
+from .compiler import (
+    assemble_prompt,
+    build_opaque_attachment,
+    compile_prompt_parts,
+    prompt_hash,
+)
 from .contracts import (
     get_hash,
     get_opaque_fields,
@@ -35,7 +42,7 @@ from .trace import TraceRecord, record
 # InferSpec
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class InferSpec:
     """All metadata from the @infer decorator plus resolved type info."""
 
@@ -57,18 +64,28 @@ class InferSpec:
     parameters: dict[str, Any]
 
 
+_SYSTEM_PROMPT = (
+    "You are executing a typed function. "
+    "Your output must conform to the specified contract."
+)
+
+
 # ---------------------------------------------------------------------------
 # Cache stores
 # ---------------------------------------------------------------------------
 
 # session cache: scoped to the current @flow execution via _FlowContext.session_cache.
 # Falls back to a process-level dict for @infer calls made outside a @flow.
-_process_session_cache: dict[str, Any] = {}
+# Keyed by (fn_qualname, inputs_hash).
+_process_session_cache: dict[tuple, Any] = {}
 # global cache: keyed by (fn_qualname, inputs_hash, contract_hash)
-_global_cache: dict[str, Any] = {}
+_global_cache: dict[tuple, Any] = {}
 
+# Sentinel for single-probe cache lookups — cached values may legitimately be None.
+_MISS = object()
 
-def _get_session_cache() -> dict[str, Any]:
+
+def _get_session_cache() -> dict[tuple, Any]:
     """Return the session cache scoped to the current @flow, or a process-level fallback."""
     from .decorators import _flow_ctx  # lazy import avoids circular dependency
     ctx = _flow_ctx.get()
@@ -79,8 +96,6 @@ def _get_session_cache() -> dict[str, Any]:
 
 def _inputs_hash(inputs: dict[str, Any]) -> str:
     """Stable hash of inputs dict for cache keying."""
-    import hashlib
-
     try:
         canonical = json.dumps(inputs, sort_keys=True, default=str)
     except Exception:
@@ -160,7 +175,7 @@ async def execute_infer(
     # ------------------------------------------------------------------
     # Effective budget: per-call overrides flow budget.
     # Clone spec.budget so each invocation gets a fresh clock and cost counter —
-    # Budget._start_ms is set at Budget() creation time (decoration time), so
+    # Budget's deadline is fixed at Budget() creation time (decoration time), so
     # without cloning the time window shrinks across calls.
     # ------------------------------------------------------------------
     budget: Budget | None = spec.budget.clone() if spec.budget is not None else flow_budget
@@ -192,32 +207,21 @@ async def execute_infer(
     # ------------------------------------------------------------------
     # Cache check (session / global)
     # ------------------------------------------------------------------
-    ih = _inputs_hash(inputs)
+    # Keys are tuples rather than formatted strings: the component strings
+    # cache their own hashes, so no long key string is built or re-hashed.
+    # The inputs hash is only computed when a cache is actually in play.
+    cache_store: dict[tuple, Any] | None = None
+    cache_key: tuple = ()
     if spec.cache == "session":
-        cache_key = f"{fn_qualname}:{ih}"
-        if cache_key in _get_session_cache():
-            cached = _get_session_cache()[cache_key]
-            # Spec §8.3: cached results still pass through ensure validation.
-            _run_ensure(spec.ensure, cached, fn_name)
-            _write_trace(
-                fn_qualname=fn_qualname,
-                model=spec.model or get_config()["default_model"],
-                inputs=inputs,
-                c_hash=c_hash,
-                attempts=0,
-                output=cached,
-                duration_ms=0,
-                total_cost=None,
-                all_retry_reasons=[],
-                cache_hit=True,
-                flow_id=flow_id,
-                last_prompt="",
-            )
-            return cached
+        cache_store = _get_session_cache()
+        cache_key = (fn_qualname, _inputs_hash(inputs))
     elif spec.cache == "global":
-        cache_key = f"{fn_qualname}:{ih}:{c_hash}"
-        if cache_key in _global_cache:
-            cached = _global_cache[cache_key]
+        cache_store = _global_cache
+        cache_key = (fn_qualname, _inputs_hash(inputs), c_hash)
+
+    if cache_store is not None:
+        cached = cache_store.get(cache_key, _MISS)
+        if cached is not _MISS:
             # Spec §8.3: cached results still pass through ensure validation.
             _run_ensure(spec.ensure, cached, fn_name)
             _write_trace(
@@ -229,7 +233,7 @@ async def execute_infer(
                 output=cached,
                 duration_ms=0,
                 total_cost=None,
-                all_retry_reasons=[],
+                all_retry_reasons=None,
                 cache_hit=True,
                 flow_id=flow_id,
                 last_prompt="",
@@ -239,8 +243,8 @@ async def execute_infer(
     # ------------------------------------------------------------------
     # Retry loop
     # ------------------------------------------------------------------
-    retry_reasons: list[str] = []
-    all_retry_reasons: list[str] = []
+    # retry_reasons holds the previous attempt's failures (none before the first).
+    retry_reasons: Sequence[str] = ()
     retry_history: list[list[str]] = []
     start = time.monotonic()
     total_cost: float = 0.0
@@ -248,47 +252,45 @@ async def execute_infer(
     last_prompt = ""
     last_failure_was_parse = True  # updated each attempt; True → parse/extract, False → ensure
 
+    # Everything in the prompt except the retry block is fixed for this call,
+    # as is the serialized opaque attachment — build both once, not per attempt.
+    prompt_head, prompt_tail = compile_prompt_parts(
+        intent=spec.intent,
+        context=spec.context,
+        inputs=inputs,
+        opaque_fields=opaque_params,
+    )
+    attachment = build_opaque_attachment(inputs, opaque_params)
+    attachment_suffix = (
+        f"\n\nData:\n{json.dumps(attachment)}" if attachment is not None else ""
+    )
+
+    # Anthropic prompt caching: wrap stable content in cache_control blocks
+    _is_anthropic = model.startswith("claude") or model.startswith("anthropic/")
+
     for attempt in range(spec.retries + 1):
         # a. Check budgets before each attempt
-        if budget is not None and budget.is_cost_exceeded():
+        if budget is not None and (budget.is_cost_exceeded() or budget.is_expired()):
             raise BudgetExceeded(fn_name, budget)
-        if budget is not None:
-            remaining = budget.remaining_seconds()
-            if remaining is not None and remaining <= 0:
-                raise BudgetExceeded(fn_name, budget)
-
-        # b. Compile prompt
-        prompt = compile_prompt(
-            intent=spec.intent,
-            context=spec.context,
-            inputs=inputs,
-            opaque_fields=opaque_params,
-            retry_reasons=retry_reasons,
-        )
-        last_prompt = prompt
 
-        # Build messages
-        system_msg = (
-            "You are executing a typed function. "
-            "Your output must conform to the specified contract."
-        )
-        user_content = prompt
+        # b. Compile prompt (splice this attempt's retry block into the fixed parts)
+        prompt = assemble_prompt(prompt_head, retry_reasons, prompt_tail)
+        last_prompt = prompt
 
         # Attach opaque data
-        attachment = build_opaque_attachment(inputs, opaque_params)
-        if attachment is not None:
-            user_content = user_content + f"\n\nData:\n{json.dumps(attachment)}"
+        user_content = prompt + attachment_suffix
 
-        # Anthropic prompt caching: wrap stable content in cache_control blocks
-        _is_anthropic = model.startswith("claude") or model.startswith("anthropic/")
+        # Messages, tool and kwargs are rebuilt per attempt: litellm receives them
+        # by reference, so a provider transform on one attempt must not leak
+        # into the next.
         if _is_anthropic:
             messages = [
-                {"role": "system", "content": [{"type": "text", "text": system_msg, "cache_control": {"type": "ephemeral"}}]},
+                {"role": "system", "content": [{"type": "text", "text": _SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]},
                 {"role": "user", "content": [{"type": "text", "text": user_content, "cache_control": {"type": "ephemeral"}}]},
             ]
         else:
             messages = [
-                {"role": "system", "content": system_msg},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": user_content},
             ]
 
@@ -331,20 +333,16 @@ async def execute_infer(
             # failing and exhaust retries, then raise ParseFailure.
             parse_reason = f"LLM API error ({exc.__class__.__name__}): {str(exc)[:300]}"
             retry_reasons = [parse_reason]
-            all_retry_reasons.append(parse_reason)
-            retry_history.append([parse_reason])
+            retry_history.append(retry_reasons)
             last_failure_was_parse = True
             continue
 
         # e. Track cost
-        try:
-            cost = litellm.completion_cost(completion_response=response)
-            if cost and budget is not None:
+        cost = _response_cost(response)
+        if cost:
+            total_cost += cost
+            if budget is not None:
                 budget.record_cost(cost)
-            if cost:
-                total_cost += cost
-        except Exception:
-            cost = 0.0
 
         # f. Extract tool call result
         try:
@@ -355,8 +353,7 @@ async def execute_infer(
         except (AttributeError, IndexError, TypeError, ValueError) as exc:
             parse_reason = f"Failed to extract tool call: {exc}"
             retry_reasons = [parse_reason]
-            all_retry_reasons.append(parse_reason)
-            retry_history.append([parse_reason])
+            retry_history.append(retry_reasons)
             last_failure_was_parse = True
             continue
 
@@ -366,8 +363,7 @@ async def execute_infer(
         except json.JSONDecodeError as exc:
             parse_reason = f"JSON parse error: {exc}"
             retry_reasons = [parse_reason]
-            all_retry_reasons.append(parse_reason)
-            retry_history.append([parse_reason])
+            retry_history.append(retry_reasons)
             last_failure_was_parse = True
             continue
 
@@ -383,8 +379,7 @@ async def execute_infer(
             except Exception as exc:
                 parse_reason = f"Instantiation error: {exc}"
                 retry_reasons = [parse_reason]
-                all_retry_reasons.append(parse_reason)
-                retry_history.append([parse_reason])
+                retry_history.append(retry_reasons)
                 last_failure_was_parse = True
                 continue
         else:
@@ -419,37 +414,38 @@ async def execute_infer(
                 output=parsed,
                 duration_ms=duration_ms,
                 total_cost=cost_usd,
-                all_retry_reasons=all_retry_reasons,
+                all_retry_reasons=[r for reasons in retry_history for r in reasons],
                 cache_hit=False,
                 flow_id=flow_id,
                 last_prompt=last_prompt,
             )
 
             # Store in cache if requested
-            if spec.cache == "session":
-                _get_session_cache()[f"{fn_qualname}:{ih}"] = parsed
-            elif spec.cache == "global":
-                _global_cache[f"{fn_qualname}:{ih}:{c_hash}"] = parsed
-
-            # Export via tracer if configured
-            _export_trace_if_configured(
-                fn_qualname=fn_qualname,
-                model=model,
-                c_hash=c_hash,
-                attempts=attempt + 1,
-                cost_usd=cost_usd,
-                cache_hit=False,
-                flow_id=flow_id,
-                duration_ms=duration_ms,
-                response=response,
-            )
+            if cache_store is not None:
+                cache_store[cache_key] = parsed
+
+            # Export via tracer if configured. Checked here so the common
+            # no-tracer path never reaches the span-building helper.
+            tracer = get_config()["tracer"]
+            if tracer is not None:
+                _export_trace(
+                    tracer,
+                    fn_qualname=fn_qualname,
+                    model=model,
+                    c_hash=c_hash,
+                    attempts=attempt + 1,
+                    cost_usd=cost_usd,
+                    cache_hit=False,
+                    flow_id=flow_id,
+                    duration_ms=duration_ms,
+                    response=response,
+                )
 
             return parsed
 
         # Violations found — accumulate and retry
         last_failure_was_parse = False
-        retry_history.append(list(violations))
-        all_retry_reasons.extend(violations)
+        retry_history.append(violations)
         retry_reasons = violations
 
     # ------------------------------------------------------------------
@@ -459,7 +455,7 @@ async def execute_infer(
     # last_failure_was_parse tracks the most recent failure path.
     if last_failure_was_parse and retry_reasons:
         raise ParseFailure(fn_name, "", "; ".join(retry_reasons))
-    raise PostconditionFailed(fn_name, retry_reasons, retry_history)
+    raise PostconditionFailed(fn_name, list(retry_reasons), retry_history)
 
 
 # ---------------------------------------------------------------------------
@@ -485,6 +481,25 @@ def _run_ensure(ensure_fns: list[Callable], value: Any, fn_name: str) -> None:
         raise PostconditionFailed(fn_name, violations, [violations])
 
 
+def _response_cost(response: Any) -> float:
+    """
+    Return the USD cost of a litellm response, or 0.0 if it cannot be priced.
+
+    litellm attaches the cost it already computed to the response's hidden
+    params; completion_cost() — which re-resolves provider pricing and raises
+    for unmapped models — is only consulted when that is absent.
+    """
+    hidden = getattr(response, "_hidden_params", None)
+    if isinstance(hidden, dict):
+        cost = hidden.get("response_cost")
+        if isinstance(cost, (int, float)):
+            return cost
+    try:
+        return litellm.completion_cost(completion_response=response) or 0.0
+    except Exception:
+        return 0.0
+
+
 def _write_trace(
     fn_qualname: str,
     model: str,
@@ -494,7 +509,7 @@ def _write_trace(
     output: Any,
     duration_ms: int,
     total_cost: float | None,
-    all_retry_reasons: list[str],
+    all_retry_reasons: list[str] | None,
     cache_hit: bool,
     flow_id: str | None,
     last_prompt: str,
@@ -511,27 +526,41 @@ def _write_trace(
         duration_ms=duration_ms,
         cost_usd=total_cost,
         cache_hit=cache_hit,
-        retry_reasons=all_retry_reasons,
+        retry_reasons=all_retry_reasons if all_retry_reasons is not None else [],
         flow_id=flow_id,
         review_id=None,
     )
     record(trace)
 
 
+# gen_ai.system derivation tables: substring match on the full model string,
+# then prefix match on the bare model name (provider prefix stripped).
+_SYSTEM_BY_SUBSTR: tuple[tuple[str, str], ...] = (
+    ("claude", "anthropic"),
+    ("gemini", "google"),
+)
+_SYSTEM_BY_PREFIX: tuple[tuple[tuple[str, ...], str], ...] = (
+    (("gpt-", "o1", "o3", "o4"), "openai"),
+)
+
+
+@functools.lru_cache(maxsize=256)
 def _derive_gen_ai_system(model: str) -> str:
+    """Map a litellm model string to an OTel gen_ai.system value (memoised per model)."""
     m = model.lower()
-    if "claude" in m:
-        return "anthropic"
-    if "gemini" in m:
-        return "google"
+    for needle, system in _SYSTEM_BY_SUBSTR:
+        if needle in m:
+            return system
     # Strip provider prefix (e.g. "openai/gpt-4") before matching OpenAI model names
-    bare = m.split("/")[-1]
-    if bare.startswith(("gpt-", "o1", "o3", "o4")):
-        return "openai"
-    return m.split("/")[0] if "/" in m else "unknown"
+    provider, _, bare = m.rpartition("/")
+    for prefixes, system in _SYSTEM_BY_PREFIX:
+        if bare.startswith(prefixes):
+            return system
+    return m.split("/")[0] if provider else "unknown"
 
 
-def _export_trace_if_configured(
+def _export_trace(
+    tracer: Callable[[dict[str, Any]], Any],
     fn_qualname: str,
     model: str,
     c_hash: str,
@@ -542,11 +571,7 @@ def _export_trace_if_configured(
     duration_ms: int,
     response: Any,
 ) -> None:
-    """Emit to OTel tracer if one is configured."""
-    tracer = get_config().get("tracer")
-    if tracer is None:
-        return
-
+    """Emit span attributes for a successful call to the configured OTel tracer."""
     try:
         # Extract token usage if available
         usage = getattr(response, "usage", None)
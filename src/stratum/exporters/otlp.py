@@ -93,9 +93,10 @@ def _build_otlp_body(
     end_time_unix_nano = now_ns
 
     # Use flow_id as traceId so all @infer spans within a @flow share the same
-    # trace and appear together in OTLP backends. flow_id is a UUID4 — strip
-    # hyphens to get the 32-hex-char format OTLP requires. Fall back to a
-    # fresh random ID for @infer calls made outside a @flow.
+    # trace and appear together in OTLP backends. @flow and FlowScope already
+    # generate 32-hex-char ids, the format OTLP requires; hyphens are only
+    # stripped when a caller passes its own UUID string to execute_infer.
+    # Fall back to a fresh random ID for @infer calls made outside a @flow.
     flow_id: str | None = span_attrs.get("stratum.flow_id")
     trace_id = flow_id.replace("-", "") if flow_id else secrets.token_hex(16)
 
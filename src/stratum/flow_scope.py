@@ -1,7 +1,7 @@
 """Public FlowScope — async context manager for establishing flow execution context."""
 from __future__ import annotations
 
-import uuid
+import secrets
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
@@ -15,13 +15,14 @@ from .decorators import _FlowContext, _flow_ctx
 async def FlowScope(budget: Budget | None = None) -> AsyncGenerator[str, None]:
     """
     Async context manager. Establishes a flow context for the duration of the block.
-    Yields the flow_id. All execute_infer calls within the block inherit this
+    Yields the flow_id (32 hex chars — usable directly as an OTLP traceId).
+    All execute_infer calls within the block inherit this
     flow_id, budget, and session cache.
 
         async with FlowScope(budget=Budget(ms=5000)) as flow_id:
             result = await execute_infer(spec, inputs, flow_budget=budget, flow_id=flow_id)
     """
-    flow_id = str(uuid.uuid4())
+    flow_id = secrets.token_hex(16)
     flow_budget = budget.clone() if budget is not None else None
     ctx = _FlowContext(flow_id=flow_id, budget=flow_budget)
     token = _flow_ctx.set(ctx)
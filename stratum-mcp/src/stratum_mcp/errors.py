@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Callable
 
 
 # ---------------------------------------------------------------------------
@@ -44,39 +44,65 @@ class MCPExecutionError(Exception):
 # MCP error translation
 # ---------------------------------------------------------------------------
 
+def _parse_error(exc: IRParseError) -> dict[str, Any]:
+    return {
+        "success": False,
+        "error_type": "ir_parse_error",
+        "message": f"YAML syntax error: {exc.raw_error}",
+        "suggestion": "Check YAML syntax — indentation, colons, quoting.",
+    }
+
+
+def _validation_error(exc: IRValidationError) -> dict[str, Any]:
+    return {
+        "success": False,
+        "error_type": "ir_validation_error",
+        "path": exc.path,
+        "message": exc.message,
+        "suggestion": exc.suggestion,
+    }
+
+
+def _semantic_error(exc: IRSemanticError) -> dict[str, Any]:
+    return {
+        "success": False,
+        "error_type": "ir_semantic_error",
+        "path": exc.path,
+        "message": str(exc),
+    }
+
+
+def _execution_error(exc: MCPExecutionError) -> dict[str, Any]:
+    return {
+        "success": False,
+        "error_type": "execution_error",
+        "message": str(exc),
+    }
+
+
+# Exact-type dispatch for exception_to_mcp_error. Subclasses resolve through
+# their MRO, so lookups behave like the isinstance chain they replace.
+MCP_ERROR_MAP: dict[type, Callable[[Any], dict[str, Any]]] = {
+    IRParseError: _parse_error,
+    IRValidationError: _validation_error,
+    IRSemanticError: _semantic_error,
+    MCPExecutionError: _execution_error,
+}
+
+# The spec-loading failures tool handlers report back to the caller.
+IR_ERRORS = (IRParseError, IRValidationError, IRSemanticError)
+
+
 def exception_to_mcp_error(exc: Exception) -> dict[str, Any]:
     """
     Single translation point. Maps any exception to a structured MCP response dict.
     Never raises. Never exposes internal stack traces.
     """
-    if isinstance(exc, IRParseError):
-        return {
-            "success": False,
-            "error_type": "ir_parse_error",
-            "message": f"YAML syntax error: {exc.raw_error}",
-            "suggestion": "Check YAML syntax — indentation, colons, quoting.",
-        }
-    if isinstance(exc, IRValidationError):
-        return {
-            "success": False,
-            "error_type": "ir_validation_error",
-            "path": exc.path,
-            "message": exc.message,
-            "suggestion": exc.suggestion,
-        }
-    if isinstance(exc, IRSemanticError):
-        return {
-            "success": False,
-            "error_type": "ir_semantic_error",
-            "path": exc.path,
-            "message": str(exc),
-        }
-    if isinstance(exc, MCPExecutionError):
-        return {
-            "success": False,
-            "error_type": "execution_error",
-            "message": str(exc),
-        }
+    mapper = MCP_ERROR_MAP.get(type(exc))
+    if mapper is None:
+        mapper = next((MCP_ERROR_MAP[t] for t in type(exc).__mro__ if t in MCP_ERROR_MAP), None)
+    if mapper is not None:
+        return mapper(exc)
     return {
         "success": False,
         "error_type": "internal_error",
@@ -1,16 +1,24 @@
 """Flow controller: plan state management, $ reference resolution, ensure compilation."""
 from __future__ import annotations
 
+import ast
 import concurrent.futures
 import copy
+import functools
 import hashlib
+import itertools
 import json
+import mmap
+import operator
 import os
 import re
+import stat
+import threading
 import time
 import types
 import uuid
 import dataclasses
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Callable
@@ -18,7 +26,7 @@ from typing import Any, Callable
 from jsonschema import Draft202012Validator
 
 from .errors import MCPExecutionError
-from .spec import IRSpec, IRFlowDef, IRStepDef
+from .spec import IRSpec, IRFlowDef, IRFunctionDef, IRStepDef
 
 
 # ---------------------------------------------------------------------------
@@ -82,15 +90,30 @@ _FILE_CONTAINS_SIZE_LIMIT = 10 * 1024 * 1024  # 10 MB
 
 
 def _file_contains(path: str, substring: str) -> bool:
-    """Return True if path exists, is under the size limit, and contains substring."""
+    """Return True if path exists, is under the size limit, and contains substring.
+
+    Read on every call: a same-size rewrite within one mtime tick is invisible to
+    stat, and a stale ensure verdict is worse than re-reading at most 10 MB.
+
+    ASCII substrings are searched in the raw bytes via mmap: ASCII bytes never
+    belong to a multi-byte or invalid UTF-8 sequence, so the result matches the
+    decoded search without building a str. Other substrings keep the decoded path.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if not stat.S_ISREG(st.st_mode) or st.st_size > _FILE_CONTAINS_SIZE_LIMIT:
+        return False
     try:
-        if not os.path.isfile(path):
-            return False
-        if os.path.getsize(path) > _FILE_CONTAINS_SIZE_LIMIT:
-            return False
+        if substring.isascii():
+            if st.st_size == 0:
+                return substring == ""
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                return m.find(substring.encode("ascii")) != -1
         with open(path, encoding="utf-8", errors="replace") as f:
             return substring in f.read()
-    except OSError:
+    except (OSError, ValueError):
         return False
 
 
@@ -163,7 +186,76 @@ _ENSURE_BUILTINS: dict[str, Any] = {
     "no_file_conflicts": _no_file_conflicts,
 }
 
+# eval() globals, built once. eval() needs a real dict here, so these are not
+# frozen — treat them as read-only.
+_ENSURE_GLOBALS: dict[str, Any] = {"__builtins__": {}, **_ENSURE_BUILTINS}
+_SKIP_IF_GLOBALS: dict[str, Any] = {
+    "__builtins__": {}, "None": None, "True": True, "False": False,
+    "true": True, "false": False, "null": None,
+    **_ENSURE_BUILTINS,
+}
+
+
+_FAST_COMPARE_OPS: dict[type[ast.cmpop], Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
 
+def _result_field_getter(node: ast.expr) -> Callable[[Any], Any] | None:
+    """Return a getter for ``result.<field>`` or ``len(result.<field>)``, else None."""
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "result":
+        attr = node.attr
+
+        def get(result: Any) -> Any:
+            return result[attr] if isinstance(result, dict) else getattr(result, attr)
+        return get
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name) and node.func.id == "len"
+        and len(node.args) == 1 and not node.keywords
+    ):
+        inner = _result_field_getter(node.args[0])
+        if inner is not None:
+            return lambda result: len(inner(result))
+    return None
+
+
+def _fast_ensure(tree: ast.Expression) -> Callable[[Any], Any] | None:
+    """
+    Build a direct-access evaluator for the common ensure shapes, bypassing eval():
+
+      result.<field>
+      result.<field> <op> <constant>
+      len(result.<field>) <op> <constant>
+
+    Returns None for anything else; those expressions keep the eval() path.
+    """
+    body = tree.body
+    getter = _result_field_getter(body)
+    if getter is not None:
+        return getter
+    if (
+        isinstance(body, ast.Compare)
+        and len(body.ops) == 1
+        and type(body.ops[0]) in _FAST_COMPARE_OPS
+        and isinstance(body.comparators[0], ast.Constant)
+    ):
+        getter = _result_field_getter(body.left)
+        if getter is not None:
+            op = _FAST_COMPARE_OPS[type(body.ops[0])]
+            value = body.comparators[0].value
+            return lambda result: op(getter(result), value)
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
 def compile_ensure(expr: str) -> Callable[[Any], bool]:
     """
     Compile 'result.field > value' string into a callable.
@@ -171,6 +263,12 @@ def compile_ensure(expr: str) -> Callable[[Any], bool]:
     If the result is a dict, it is wrapped in SimpleNamespace so that
     attribute-style access (result.confidence) works on dict outputs.
 
+    Memoized per expression string: retries and repeated flows reuse the same
+    code object and evaluator instead of calling compile() again. Simple
+    comparisons on result fields skip eval() entirely (see _fast_ensure); if the
+    fast path raises, the expression is re-run through eval() so errors read
+    exactly as before.
+
     Safety: __builtins__ is empty. Dunder attributes are blocked at compile time.
     """
     if "__" in expr:
@@ -178,15 +276,22 @@ def compile_ensure(expr: str) -> Callable[[Any], bool]:
             f"Ensure expression may not contain dunder attributes: {expr!r}"
         )
     try:
-        code = compile(expr, "<ensure_expr>", "eval")
+        tree = compile(expr, "<ensure_expr>", "eval", ast.PyCF_ONLY_AST)
+        code = compile(tree, "<ensure_expr>", "eval")
     except SyntaxError as exc:
         raise EnsureCompileError(f"Cannot compile ensure expression {expr!r}: {exc}") from exc
+    fast = _fast_ensure(tree)
 
     def evaluator(result: Any) -> bool:
+        if fast is not None:
+            try:
+                return bool(fast(result))
+            except Exception:
+                pass
         if isinstance(result, dict):
             result = types.SimpleNamespace(**result)
         try:
-            return bool(eval(code, {"__builtins__": {}, **_ENSURE_BUILTINS}, {"result": result}))
+            return bool(eval(code, _ENSURE_GLOBALS, {"result": result}))
         except Exception as exc:
             raise EnsureCompileError(
                 f"Ensure expression {expr!r} raised: {exc}"
@@ -200,13 +305,45 @@ def compile_ensure_list(exprs: list[str]) -> list[Callable[[Any], bool]]:
     return [compile_ensure(e) for e in exprs]
 
 
+_MAX_SCHEMA_ERRORS = 10
+
+# Guards eviction in the identity-keyed caches below; create_flow_state can run
+# on a worker thread (server.stratum_plan).
+_identity_cache_lock = threading.Lock()
+
+# Validators interned by schema identity. Schemas live on frozen IRStepDefs and are
+# never mutated; each entry keeps its schema alive so the id cannot be reused.
+_VALIDATOR_CACHE_MAX = 256
+_validator_cache: dict[int, tuple[dict[str, Any], Draft202012Validator]] = {}
+
+
+def _validator_for(schema: dict[str, Any]) -> Draft202012Validator:
+    """Return a Draft202012Validator for schema, building it once per schema object."""
+    entry = _validator_cache.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        entry = (schema, Draft202012Validator(schema))
+        with _identity_cache_lock:
+            if len(_validator_cache) >= _VALIDATOR_CACHE_MAX:
+                del _validator_cache[next(iter(_validator_cache))]
+            _validator_cache[id(schema)] = entry
+    return entry[1]
+
+
 def _validate_output_schema(result: dict[str, Any], schema: dict[str, Any]) -> list[str]:
     """Validate result dict against a JSON Schema. Returns list of violation strings."""
-    validator = Draft202012Validator(schema)
+    return _schema_violations(_validator_for(schema), result)
+
+
+def _schema_violations(validator: Draft202012Validator, result: dict[str, Any]) -> list[str]:
+    """Run a prebuilt validator against result. Returns list of violation strings.
+
+    Stops after _MAX_SCHEMA_ERRORS: enough feedback for a retry without walking
+    every branch of a badly shaped result.
+    """
     try:
         return [
             f"output_schema violation: {e.message}"
-            for e in validator.iter_errors(result)
+            for e in itertools.islice(validator.iter_errors(result), _MAX_SCHEMA_ERRORS)
         ]
     except Exception as exc:
         return [f"output_schema violation: schema error — {exc}"]
@@ -220,6 +357,33 @@ class RefResolutionError(Exception):
     pass
 
 
+@functools.lru_cache(maxsize=4096)
+def _parse_ref(ref: str) -> tuple[str, str, tuple[str, ...] | None]:
+    """
+    Split a $ reference into a tagged tuple, once per distinct ref string.
+
+      $.input.<field>               → ("input", field, None)
+      $.steps.<step_id>.output[.<f>] → ("steps", step_id, (f, ...))
+      $.steps.<step_id>.<other>     → ("steps", step_id, None)  — rejected at resolve time
+
+    The malformed-steps case is deferred so resolve_ref reports a missing step
+    before a bad path segment, as it always has.
+    """
+    # Use ref[2:] to strip the literal "$." prefix, not lstrip which strips a char set.
+    parts = ref[2:].split(".")
+    if not parts or parts == [""]:
+        raise RefResolutionError(f"Empty $ reference: {ref!r}")
+    if parts[0] == "input":
+        if len(parts) < 2:
+            raise RefResolutionError(f"$.input requires a field name: {ref!r}")
+        return ("input", parts[1], None)
+    if parts[0] == "steps":
+        if len(parts) < 3:
+            raise RefResolutionError(f"$.steps requires $.steps.<id>.output: {ref!r}")
+        return ("steps", parts[1], tuple(parts[3:]) if parts[2] == "output" else None)
+    raise RefResolutionError(f"Unknown $ prefix '{parts[0]}' in {ref!r}")
+
+
 def resolve_ref(ref: str, flow_inputs: dict[str, Any], step_outputs: dict[str, Any]) -> Any:
     """
     Resolve a $ reference or return literal value.
@@ -235,53 +399,43 @@ def resolve_ref(ref: str, flow_inputs: dict[str, Any], step_outputs: dict[str, A
     """
     if not ref.startswith("$"):
         return ref
-    # Use ref[2:] to strip the literal "$." prefix, not lstrip which strips a char set.
-    parts = ref[2:].split(".")
-    if not parts or parts == [""]:
-        raise RefResolutionError(f"Empty $ reference: {ref!r}")
-    if parts[0] == "input":
-        if len(parts) < 2:
-            raise RefResolutionError(f"$.input requires a field name: {ref!r}")
-        field_name = parts[1]
-        if field_name not in flow_inputs:
-            raise RefResolutionError(f"$.input.{field_name} not found in flow inputs")
-        return flow_inputs[field_name]
-    if parts[0] == "steps":
-        if len(parts) < 3:
-            raise RefResolutionError(f"$.steps requires $.steps.<id>.output: {ref!r}")
-        step_id = parts[1]
-        if step_id not in step_outputs:
-            raise RefResolutionError(
-                f"$.steps.{step_id} not yet executed — check depends_on ordering"
-            )
-        output = step_outputs[step_id]
-        if parts[2] != "output":
-            raise RefResolutionError(
-                f"Expected '$.steps.<id>.output[.<field>]', got {ref!r}"
-            )
-        # None propagation: skipped steps have output=None; any field access returns None.
+    kind, name, path = _parse_ref(ref)
+    if kind == "input":
+        if name not in flow_inputs:
+            raise RefResolutionError(f"$.input.{name} not found in flow inputs")
+        return flow_inputs[name]
+    step_id = name
+    if step_id not in step_outputs:
+        raise RefResolutionError(
+            f"$.steps.{step_id} not yet executed — check depends_on ordering"
+        )
+    output = step_outputs[step_id]
+    if path is None:
+        raise RefResolutionError(
+            f"Expected '$.steps.<id>.output[.<field>]', got {ref!r}"
+        )
+    # None propagation: skipped steps have output=None; any field access returns None.
+    if output is None:
+        return None
+    for key in path:
         if output is None:
             return None
-        for key in parts[3:]:
-            if output is None:
-                return None
-            if isinstance(output, dict):
-                try:
-                    output = output[key]
-                except KeyError:
-                    raise RefResolutionError(
-                        f"Key '{key}' not found in $.steps.{step_id}.output — "
-                        f"available keys: {sorted(output.keys())}"
-                    )
-            else:
-                try:
-                    output = getattr(output, key)
-                except AttributeError:
-                    raise RefResolutionError(
-                        f"Attribute '{key}' not found on $.steps.{step_id}.output"
-                    )
-        return output
-    raise RefResolutionError(f"Unknown $ prefix '{parts[0]}' in {ref!r}")
+        if isinstance(output, dict):
+            try:
+                output = output[key]
+            except KeyError:
+                raise RefResolutionError(
+                    f"Key '{key}' not found in $.steps.{step_id}.output — "
+                    f"available keys: {sorted(output.keys())}"
+                )
+        else:
+            try:
+                output = getattr(output, key)
+            except AttributeError:
+                raise RefResolutionError(
+                    f"Attribute '{key}' not found on $.steps.{step_id}.output"
+                )
+    return output
 
 
 def resolve_inputs(
@@ -299,6 +453,35 @@ def resolve_inputs(
 # skip_if evaluation
 # ---------------------------------------------------------------------------
 
+_SKIP_IF_REF_RE = re.compile(r'\$\.[A-Za-z0-9_.]+')
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_skip_if(expr: str) -> tuple[Callable[..., Any], tuple[str, ...]] | None:
+    """Compile a skip_if expression once into a function of its $ references.
+
+    Returns (fn, refs): fn takes one positional argument per entry of refs, in
+    order, and evaluates the expression against _SKIP_IF_GLOBALS. Returns None
+    if the expression does not compile.
+    """
+    refs: list[str] = []
+
+    def name_ref(m: re.Match) -> str:
+        refs.append(m.group(0))
+        return f"_skip_ref_{len(refs) - 1}"
+
+    body = _SKIP_IF_REF_RE.sub(name_ref, expr)
+    params = ", ".join(f"_skip_ref_{i}" for i in range(len(refs)))
+    try:
+        compile(body, "<skip_if>", "eval")  # reject anything that is not one expression
+        # Parameters rather than extra globals or eval locals: comprehension
+        # bodies see them as closure variables, and nothing is copied per call.
+        fn = eval(compile(f"lambda {params}: ({body}\n)", "<skip_if>", "eval"), _SKIP_IF_GLOBALS)
+    except Exception:
+        return None
+    return fn, tuple(refs)
+
+
 def evaluate_skip_if(
     expr: str,
     flow_inputs: dict[str, Any],
@@ -309,29 +492,32 @@ def evaluate_skip_if(
 
     $ references ($.steps.X.output.field, $.input.field) are resolved first;
     unresolvable or null references evaluate to None rather than raising.
-    The substituted expression is then evaluated as a Python boolean.
+    The expression is then evaluated as a Python boolean. References are passed
+    as arguments rather than spliced in as literals, so each distinct expression
+    compiles once instead of once per evaluation.
 
     Returns False on any compilation or evaluation error (conservative: don't skip).
     """
     if "__" in expr:
         return False  # dunder guard
 
-    def replace_ref(m: re.Match) -> str:
-        ref_str = m.group(0)
-        try:
-            value = resolve_ref(ref_str, flow_inputs, step_outputs)
-            return repr(value)
-        except (RefResolutionError, Exception):
-            return repr(None)
+    compiled = _compile_skip_if(expr)
+    if compiled is None:
+        return False
+    fn, refs = compiled
 
-    # Replace all $.xxx.yyy references with their Python repr
-    processed = re.sub(r'\$\.[A-Za-z0-9_.]+', replace_ref, expr)
+    # Containers are copied so the expression works on values, as the old literal
+    # splice did, and cannot mutate step outputs.
+    args = []
+    for ref in refs:
+        try:
+            value = resolve_ref(ref, flow_inputs, step_outputs)
+        except Exception:
+            value = None
+        args.append(copy.deepcopy(value) if isinstance(value, (list, dict)) else value)
 
     try:
-        code = compile(processed, "<skip_if>", "eval")
-        return bool(eval(code, {"__builtins__": {}, "None": None, "True": True, "False": False,
-                                "true": True, "false": False, "null": None,
-                                **_ENSURE_BUILTINS}))
+        return bool(fn(*args))
     except Exception:
         return False
 
@@ -341,7 +527,7 @@ def evaluate_skip_if(
 # ---------------------------------------------------------------------------
 
 def _topological_sort(flow_def: IRFlowDef) -> list[IRStepDef]:
-    """Kahn's algorithm on explicit depends_on + implicit $ ref dependencies."""
+    """Kahn's algorithm on explicit depends_on + implicit $ ref dependencies. O(V+E)."""
     steps_by_id = {s.id: s for s in flow_def.steps}
     dep_graph: dict[str, set[str]] = {s.id: set(s.depends_on) for s in flow_def.steps}
     for step in flow_def.steps:
@@ -351,25 +537,49 @@ def _topological_sort(flow_def: IRFlowDef) -> list[IRStepDef]:
                 if len(parts) >= 3:
                     dep_graph[step.id].add(parts[2])
 
+    # Successor lists in step declaration order, so ties keep the same order as before.
+    successors: dict[str, list[str]] = {sid: [] for sid in dep_graph}
+    for sid, deps in dep_graph.items():
+        for dep in deps:
+            if dep in successors:
+                successors[dep].append(sid)
+
     in_degree = {sid: len(deps) for sid, deps in dep_graph.items()}
-    ready = [sid for sid, deg in in_degree.items() if deg == 0]
+    ready = deque(sid for sid, deg in in_degree.items() if deg == 0)
     ordered: list[IRStepDef] = []
 
     while ready:
-        sid = ready.pop(0)
+        sid = ready.popleft()
         ordered.append(steps_by_id[sid])
-        for other_id, deps in dep_graph.items():
-            if sid in deps:
-                in_degree[other_id] -= 1
-                if in_degree[other_id] == 0:
-                    ready.append(other_id)
+        for succ in successors[sid]:
+            in_degree[succ] -= 1
+            if in_degree[succ] == 0:
+                ready.append(succ)
 
     if len(ordered) != len(flow_def.steps):
-        remaining = [s for s in dep_graph if s not in {o.id for o in ordered}]
+        remaining = [sid for sid, deg in in_degree.items() if deg > 0]
         raise MCPExecutionError(f"Cycle detected in step dependencies: {remaining}")
     return ordered
 
 
+# IR dataclasses hold lists, so they are not hashable; key on identity and keep
+# the flow_def itself in the entry so its id cannot be recycled while cached.
+_SORT_CACHE_MAX = 256
+_sort_cache: dict[int, tuple[IRFlowDef, list[IRStepDef]]] = {}
+
+
+def _sorted_steps(flow_def: IRFlowDef) -> list[IRStepDef]:
+    """Return the topological order for flow_def, sorting each flow object once."""
+    entry = _sort_cache.get(id(flow_def))
+    if entry is None or entry[0] is not flow_def:
+        entry = (flow_def, _topological_sort(flow_def))
+        with _identity_cache_lock:
+            if len(_sort_cache) >= _SORT_CACHE_MAX:
+                del _sort_cache[next(iter(_sort_cache))]
+            _sort_cache[id(flow_def)] = entry
+    return list(entry[1])
+
+
 def _step_mode(step) -> str:
     """Return 'function', 'inline', 'flow', 'decompose', or 'parallel_dispatch'."""
     if step.step_type == "decompose":
@@ -430,7 +640,7 @@ def _clear_from(state: "FlowState", target_idx: int, preserve: set[str] | None =
 # Flow controller state
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class StepRecord:
     step_id: str
     function_name: str
@@ -445,7 +655,7 @@ class StepRecord:
     child_flow_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class GateRecord:
     """Trace entry written when a gate step is resolved via stratum_gate_resolve."""
     step_id: str
@@ -458,7 +668,7 @@ class GateRecord:
     round_start_step_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class SkipRecord:
     """Trace entry written when a step is skipped due to skip_if evaluating to True."""
     step_id: str
@@ -468,7 +678,7 @@ class SkipRecord:
     round_start_step_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class PolicyRecord:
     """Trace entry written when a gate step is auto-resolved by policy (flag or skip)."""
     step_id: str
@@ -480,6 +690,48 @@ class PolicyRecord:
     round_start_step_id: str | None = None
 
 
+@functools.lru_cache(maxsize=None)
+def _record_field_names(cls: type) -> tuple[str, ...]:
+    return tuple(f.name for f in dataclasses.fields(cls))
+
+
+def _record_to_dict(r: StepRecord | GateRecord | SkipRecord | PolicyRecord) -> dict[str, Any]:
+    """Flat dataclasses.asdict for trace records.
+
+    Every record field is a scalar, so asdict's recursion and deepcopy are not needed.
+    """
+    return {name: getattr(r, name) for name in _record_field_names(type(r))}
+
+
+def _cached_record_dicts(state: FlowState) -> list[dict[str, Any]]:
+    """
+    Return state.records as dicts, converting only records not seen before.
+
+    Records are never mutated after creation, so each one's dict is built once
+    and cached on the state alongside the record it came from; repeated audit
+    and persist calls only convert the records appended since the last call.
+    The returned dicts are the cached ones: only serialize them (persist_flow).
+    """
+    records = state.records
+    cache = state.record_dicts
+    n = 0
+    limit = min(len(cache), len(records))
+    while n < limit and cache[n][0] is records[n]:
+        n += 1
+    del cache[n:]
+    cache.extend((r, _record_to_dict(r)) for r in records[n:])
+    return [d for _, d in cache]
+
+
+def _records_as_dicts(state: FlowState) -> list[dict[str, Any]]:
+    """Return state.records as fresh dicts that callers may keep or mutate.
+
+    Record fields are all scalars, so a shallow copy of each cached dict is a
+    full copy: traces, checkpoints and rounds never alias one another.
+    """
+    return [dict(d) for d in _cached_record_dicts(state)]
+
+
 def _record_from_dict(r: dict) -> StepRecord | GateRecord | SkipRecord | PolicyRecord:
     """Reconstruct a StepRecord, GateRecord, or SkipRecord from a persisted dict."""
     rec_type = r.get("type", "step")
@@ -522,7 +774,7 @@ def _record_from_dict(r: dict) -> StepRecord | GateRecord | SkipRecord | PolicyR
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class FlowState:
     flow_id: str
     flow_name: str
@@ -533,7 +785,7 @@ class FlowState:
     step_outputs: dict[str, Any]     # accumulated: step_id → output (None for skipped)
     records: list[StepRecord | GateRecord | SkipRecord | PolicyRecord]  # active round's completed records
     attempts: dict[str, int]         # current attempt count per step_id
-    dispatched_at: dict[str, float]  # when each step was sent to Claude Code
+    dispatched_at: dict[str, float]  # wall-clock dispatch time of gate steps (for timeouts)
     flow_start: float
     current_idx: int = 0
     checkpoints: dict[str, Any] = field(default_factory=dict)  # label → snapshot
@@ -553,6 +805,125 @@ class FlowState:
     parent_step_id: str | None = None
     active_child_flow_id: str | None = None
     child_audits: dict[str, list[dict]] = field(default_factory=dict)
+    # Per-step tables indexed like ordered_steps; built by _precompile_steps, not persisted.
+    # step_ensures[i] is None when an expression fails to compile, so the error is
+    # reported as a violation at result time.
+    step_fn_defs: list[IRFunctionDef | None] = field(default_factory=list)
+    step_ensures: list[list[Callable[[Any], bool]] | None] = field(default_factory=list)
+    step_validators: list[Draft202012Validator | None] = field(default_factory=list)
+    step_output_fields: list[dict[str, str]] = field(default_factory=list)
+    # monotonic time of the last _flows read/write; drives idle expiry, not persisted
+    last_access: float = 0.0
+    # (record, dict) pairs backing _cached_record_dicts; not persisted
+    record_dicts: list[tuple[Any, dict[str, Any]]] = field(default_factory=list)
+    # perf_counter_ns() at the last dispatch of each non-gate step; 0 = not dispatched
+    dispatched_ns: list[int] = field(default_factory=list)
+    # False when every input is a literal, so dispatch can copy step.inputs as-is
+    step_has_refs: list[bool] = field(default_factory=list)
+    # execute_step payloads for function/inline/decompose steps (None for other modes)
+    step_dispatch: list[dict[str, Any] | None] = field(default_factory=list)
+
+
+def _precompile_steps(state: FlowState) -> None:
+    """Resolve function defs, ensures, schema validators and output fields once per flow."""
+    spec = state.spec
+    state.step_fn_defs = []
+    state.step_ensures = []
+    state.step_validators = []
+    state.step_output_fields = []
+    state.step_has_refs = []
+    state.step_dispatch = []
+    state.dispatched_ns = [0] * len(state.ordered_steps)
+    for idx, step in enumerate(state.ordered_steps):
+        fn_def = spec.functions.get(step.function) if step.function else None
+        if fn_def is not None:
+            exprs = fn_def.ensure
+            contract_name = fn_def.output_contract
+        else:
+            exprs = step.step_ensure or []
+            contract_name = step.output_contract or ""
+        try:
+            ensures: list[Callable[[Any], bool]] | None = compile_ensure_list(exprs)
+        except EnsureCompileError:
+            ensures = None
+        contract = spec.contracts.get(contract_name)
+        state.step_fn_defs.append(fn_def)
+        state.step_ensures.append(ensures)
+        state.step_validators.append(
+            _validator_for(step.output_schema)
+            if fn_def is not None and step.output_schema is not None else None
+        )
+        output_fields = {k: v.get("type", "any") for k, v in contract.fields.items()} if contract else {}
+        state.step_output_fields.append(output_fields)
+        state.step_has_refs.append(
+            any(isinstance(ref, str) and ref.startswith("$") for ref in step.inputs.values())
+        )
+        state.step_dispatch.append(_dispatch_template(state, idx, step, fn_def, output_fields))
+
+
+def _dispatch_template(
+    state: FlowState,
+    idx: int,
+    step: IRStepDef,
+    fn_def: IRFunctionDef | None,
+    output_fields: dict[str, str],
+) -> dict[str, Any] | None:
+    """
+    Build the static part of an execute_step payload for step ``idx``.
+
+    "inputs" is a placeholder and "retries_remaining" holds the full retry
+    budget; get_current_step_info fills in the resolved inputs and subtracts
+    attempts at dispatch time. Returns None for gate, flow and
+    parallel_dispatch steps, which are built per dispatch.
+    """
+    mode = _step_mode(step)
+    head = {
+        "status": "execute_step",
+        "flow_id": state.flow_id,
+        "step_number": idx + 1,
+        "total_steps": len(state.ordered_steps),
+        "step_id": step.id,
+        "step_mode": mode,
+    }
+    if mode == "function":
+        if fn_def is None or fn_def.mode == "gate":
+            return None
+        return {
+            **head,
+            "function": step.function,
+            "agent": step.agent,
+            "mode": fn_def.mode,
+            "intent": fn_def.intent,
+            "inputs": None,
+            "output_contract": fn_def.output_contract,
+            "output_fields": output_fields,
+            "ensure": fn_def.ensure,
+            "retries_remaining": fn_def.retries,
+        }
+    if mode == "inline":
+        return {
+            **head,
+            "intent": step.intent,
+            "agent": step.agent,
+            "inputs": None,
+            "output_contract": step.output_contract,
+            "output_fields": output_fields,
+            "ensure": step.step_ensure or [],
+            "retries_remaining": step.step_retries or 1,
+            "model": step.step_model,
+        }
+    if mode == "decompose":
+        return {
+            **head,
+            "intent": step.intent,
+            "agent": step.agent,
+            "inputs": None,
+            "output_contract": step.output_contract,
+            "output_fields": output_fields,
+            "ensure": step.step_ensure or [],
+            "retries_remaining": step.step_retries or 2,
+        }
+    return None
 
 
 # ---------------------------------------------------------------------------
@@ -560,7 +931,64 @@ class FlowState:
 # Declared here (not in server.py) so tests can inspect via executor_mod._flows.
 # ---------------------------------------------------------------------------
 
-_flows: dict[str, FlowState] = {}
+_FLOWS_MAX = 1024
+_FLOWS_IDLE_TTL_S = 24 * 60 * 60
+
+
+class _FlowStore(OrderedDict):
+    """
+    LRU- and idle-TTL-bounded flow_id → FlowState map.
+
+    Reads and writes mark a flow most-recently used and stamp its
+    ``last_access``; inserting past ``maxsize`` drops the least-recently used
+    entry, and in-progress flows idle longer than ``ttl`` seconds are dropped
+    on the next access. Because entries are kept in access order, expiry only
+    inspects the stale front of the map. Every handler persists before
+    returning, so an evicted in-progress flow is reloaded from disk by
+    restore_flow on its next call.
+
+    Finished flows (complete or terminal) are exempt from idle expiry: their
+    disk file is deleted when they finish, so the in-memory copy is the only
+    thing stratum_audit can still read. Only the LRU cap removes them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def __getitem__(self, key: str) -> FlowState:
+        value = super().__getitem__(key)
+        value.last_access = time.monotonic()
+        self.move_to_end(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self.expire()
+        return self[key] if key in self else default
+
+    def __setitem__(self, key: str, value: FlowState) -> None:
+        value.last_access = time.monotonic()
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+        self.expire()
+
+    def expire(self) -> None:
+        """Drop in-progress flows whose last access is older than ``ttl``."""
+        cutoff = time.monotonic() - self.ttl
+        stale: list[str] = []
+        for key, state in self.items():
+            if state.last_access > cutoff:
+                break
+            if state.terminal_status is None and state.current_idx < len(state.ordered_steps):
+                stale.append(key)
+        for key in stale:
+            del self[key]
+
+
+_flows: _FlowStore = _FlowStore(_FLOWS_MAX, _FLOWS_IDLE_TTL_S)
 
 
 # ---------------------------------------------------------------------------
@@ -579,7 +1007,7 @@ def persist_flow(state: FlowState) -> None:
         "raw_spec":           state.raw_spec,
         "inputs":             state.inputs,
         "step_outputs":       state.step_outputs,
-        "records":            [dataclasses.asdict(r) for r in state.records],
+        "records":            _cached_record_dicts(state),
         "attempts":           state.attempts,
         "current_idx":        state.current_idx,
         "checkpoints":        state.checkpoints,
@@ -596,7 +1024,12 @@ def persist_flow(state: FlowState) -> None:
         "active_child_flow_id": state.active_child_flow_id,
         "child_audits":       state.child_audits,
     }
-    (_FLOWS_DIR / f"{state.flow_id}.json").write_text(json.dumps(payload, indent=2))
+    # Compact separators keep json on its C encoder (indent forces the pure-Python
+    # one); this runs after every step. Readers (restore_flow, CLI query, the
+    # vision server) all parse the file as JSON.
+    (_FLOWS_DIR / f"{state.flow_id}.json").write_text(
+        json.dumps(payload, separators=(",", ":"))
+    )
 
 
 def restore_flow(flow_id: str) -> "FlowState | None":
@@ -604,9 +1037,9 @@ def restore_flow(flow_id: str) -> "FlowState | None":
     Reconstruct a FlowState from disk after an MCP server restart.
 
     Returns ``None`` if no persistence file exists or if it cannot be parsed.
-    Timing fields (``flow_start``, ``dispatched_at``) are reset to the current
-    monotonic time — step durations will be inaccurate for the resumed step but
-    all other state is faithfully restored.
+    Timing fields (``flow_start``, ``dispatched_at``, ``dispatched_ns``) are reset
+    to the current monotonic time — step durations will be inaccurate for the
+    resumed step but all other state is faithfully restored.
     """
     from .spec import parse_and_validate  # local import avoids circular at module level
 
@@ -624,9 +1057,9 @@ def restore_flow(flow_id: str) -> "FlowState | None":
     flow_def = spec.flows.get(payload["flow_name"])
     if flow_def is None:
         return None
-    ordered = _topological_sort(flow_def)
+    ordered = _sorted_steps(flow_def)
     records = [_record_from_dict(r) for r in payload.get("records", [])]
-    return FlowState(
+    state = FlowState(
         flow_id=payload["flow_id"],
         flow_name=payload["flow_name"],
         raw_spec=payload["raw_spec"],
@@ -653,6 +1086,8 @@ def restore_flow(flow_id: str) -> "FlowState | None":
         active_child_flow_id=payload.get("active_child_flow_id"),
         child_audits=payload.get("child_audits", {}),
     )
+    _precompile_steps(state)
+    return state
 
 
 def delete_persisted_flow(flow_id: str) -> None:
@@ -680,7 +1115,7 @@ def commit_checkpoint(state: FlowState, label: str) -> None:
     state.checkpoints[label] = {
         "step_outputs":       copy.deepcopy(state.step_outputs),
         "attempts":           dict(state.attempts),
-        "records":            [dataclasses.asdict(r) for r in state.records],
+        "records":            _records_as_dicts(state),
         "current_idx":        state.current_idx,
         "round":              state.round,
         "rounds":             copy.deepcopy(state.rounds),
@@ -729,8 +1164,8 @@ def create_flow_state(spec: IRSpec, flow_name: str, inputs: dict[str, Any], raw_
     flow_def = spec.flows.get(flow_name)
     if flow_def is None:
         raise MCPExecutionError(f"Flow '{flow_name}' not found in spec")
-    ordered = _topological_sort(flow_def)
-    return FlowState(
+    ordered = _sorted_steps(flow_def)
+    state = FlowState(
         flow_id=str(uuid.uuid4()),
         flow_name=flow_name,
         raw_spec=raw_spec,
@@ -745,6 +1180,8 @@ def create_flow_state(spec: IRSpec, flow_name: str, inputs: dict[str, Any], raw_
         current_idx=0,
         round_start_step_id=None,  # round-0 records carry None per contract
     )
+    _precompile_steps(state)
+    return state
 
 
 def skip_step(state: FlowState, step_id: str, reason: str) -> None:
@@ -789,7 +1226,7 @@ def get_current_step_info(state: FlowState) -> dict[str, Any] | None:
     step = state.ordered_steps[state.current_idx]
 
     # Gate check: only function steps can be gates.
-    fn_def = state.spec.functions.get(step.function) if step.function else None
+    fn_def = state.step_fn_defs[state.current_idx]
     is_gate = fn_def is not None and fn_def.mode == "gate"
 
     # skip_if evaluation: mode-agnostic, runs before dispatch.
@@ -843,77 +1280,29 @@ def get_current_step_info(state: FlowState) -> dict[str, Any] | None:
             "timeout": fn_def.timeout,
         }
 
-    try:
-        resolved = resolve_inputs(step.inputs, state.inputs, state.step_outputs)
-    except RefResolutionError as exc:
-        raise MCPExecutionError(str(exc)) from exc
+    if state.step_has_refs[state.current_idx]:
+        try:
+            resolved = resolve_inputs(step.inputs, state.inputs, state.step_outputs)
+        except RefResolutionError as exc:
+            raise MCPExecutionError(str(exc)) from exc
+    else:
+        resolved = dict(step.inputs)
 
-    state.dispatched_at[step.id] = time.monotonic()
+    state.dispatched_ns[state.current_idx] = time.perf_counter_ns()
     attempts_so_far = state.attempts.get(step.id, 0)
 
-    if mode == "function":
-        contract = state.spec.contracts.get(fn_def.output_contract)
-        output_fields = {k: v.get("type", "any") for k, v in contract.fields.items()} if contract else {}
-        return {
-            "status": "execute_step",
-            "flow_id": state.flow_id,
-            "step_number": state.current_idx + 1,
-            "total_steps": len(state.ordered_steps),
-            "step_id": step.id,
-            "step_mode": "function",
-            "function": step.function,
-            "agent": step.agent,
-            "mode": fn_def.mode,
-            "intent": fn_def.intent,
-            "inputs": resolved,
-            "output_contract": fn_def.output_contract,
-            "output_fields": output_fields,
-            "ensure": fn_def.ensure,
-            "retries_remaining": fn_def.retries - attempts_so_far,
-        }
-
-    elif mode == "inline":
-        max_retries = step.step_retries or 1
-        contract = state.spec.contracts.get(step.output_contract or "")
-        output_fields = {k: v.get("type", "any") for k, v in contract.fields.items()} if contract else {}
-        return {
-            "status": "execute_step",
-            "flow_id": state.flow_id,
-            "step_number": state.current_idx + 1,
-            "total_steps": len(state.ordered_steps),
-            "step_id": step.id,
-            "step_mode": "inline",
-            "intent": step.intent,
-            "agent": step.agent,
-            "inputs": resolved,
-            "output_contract": step.output_contract,
-            "output_fields": output_fields,
-            "ensure": step.step_ensure or [],
-            "retries_remaining": max_retries - attempts_so_far,
-            "model": step.step_model,
-        }
-
-    elif mode == "decompose":
-        max_retries = step.step_retries or 2
-        contract = state.spec.contracts.get(step.output_contract or "")
-        output_fields = {k: v.get("type", "any") for k, v in contract.fields.items()} if contract else {}
-        return {
-            "status": "execute_step",
-            "flow_id": state.flow_id,
-            "step_number": state.current_idx + 1,
-            "total_steps": len(state.ordered_steps),
-            "step_id": step.id,
-            "step_mode": "decompose",
-            "intent": step.intent,
-            "agent": step.agent,
-            "inputs": resolved,
-            "output_contract": step.output_contract,
-            "output_fields": output_fields,
-            "ensure": step.step_ensure or [],
-            "retries_remaining": max_retries - attempts_so_far,
-        }
-
-    elif mode == "parallel_dispatch":
+    template = state.step_dispatch[state.current_idx]
+    if template is not None:
+        info = dict(template)  # copy keeps the template's key order
+        # The template's containers are shared by every dispatch of this step and
+        # by state.step_output_fields; hand each payload its own.
+        info["output_fields"] = dict(template["output_fields"])
+        info["ensure"] = list(template["ensure"])
+        info["inputs"] = resolved
+        info["retries_remaining"] -= attempts_so_far
+        return info
+
+    if mode == "parallel_dispatch":
         # Resolve the source reference to get the task graph
         # source is guaranteed non-None by semantic validation for parallel_dispatch
         assert step.source is not None, "parallel_dispatch step must have source"
@@ -981,6 +1370,14 @@ def get_current_step_info(state: FlowState) -> dict[str, Any] | None:
         }
 
 
+def _step_duration_ms(state: FlowState, idx: int) -> int:
+    """Milliseconds since step ``idx`` was dispatched (since flow start if it never was)."""
+    started = state.dispatched_ns[idx]
+    if started:
+        return (time.perf_counter_ns() - started) // 1_000_000
+    return int((time.monotonic() - state.flow_start) * 1000)
+
+
 def process_step_result(
     state: FlowState,
     step_id: str,
@@ -1005,17 +1402,18 @@ def process_step_result(
 
     mode = _step_mode(step)
 
+    idx = state.current_idx
     if mode == "function":
-        fn_def = state.spec.functions[step.function]
+        fn_def = state.step_fn_defs[idx]
         ensure_exprs = fn_def.ensure
         max_retries = fn_def.retries
-        output_schema = step.output_schema
+        validator = state.step_validators[idx]
         fn_name = fn_def.name
         guardrail_patterns = fn_def.guardrails
     else:  # mode in ("inline", "flow", "decompose", "parallel_dispatch")
         ensure_exprs = step.step_ensure or []
         max_retries = step.step_retries or (2 if mode in ("decompose", "parallel_dispatch") else 1)
-        output_schema = None
+        validator = None
         fn_name = ""
         guardrail_patterns = step.step_guardrails or []
 
@@ -1036,12 +1434,11 @@ def process_step_result(
         )
 
     # Schema validation runs before ensures — structural errors are caught first.
-    if output_schema is not None:
-        schema_errors = _validate_output_schema(result, output_schema)
+    if validator is not None:
+        schema_errors = _schema_violations(validator, result)
         if schema_errors:
             if attempt >= max_retries:
-                dispatched = state.dispatched_at.get(step_id, state.flow_start)
-                duration_ms = int((time.monotonic() - dispatched) * 1000)
+                duration_ms = _step_duration_ms(state, idx)
                 state.records.append(_make_record(duration_ms))
                 if step.on_fail:
                     state.step_outputs[step_id] = result
@@ -1063,8 +1460,7 @@ def process_step_result(
                 f"guardrail matched: {pat!r}" for pat in guardrail_hits
             ]
             if attempt >= max_retries:
-                dispatched = state.dispatched_at.get(step_id, state.flow_start)
-                duration_ms = int((time.monotonic() - dispatched) * 1000)
+                duration_ms = _step_duration_ms(state, idx)
                 state.records.append(_make_record(duration_ms))
                 if step.on_fail:
                     state.step_outputs[step_id] = result
@@ -1076,16 +1472,19 @@ def process_step_result(
             return ("guardrail_blocked", guardrail_violations)
 
     violations: list[str] = []
-    for expr in ensure_exprs:
+    compiled_ensures = state.step_ensures[idx]
+    # Wrap a dict result once and share the namespace across every ensure,
+    # rather than letting each evaluator build its own copy.
+    result_ns = types.SimpleNamespace(**result) if isinstance(result, dict) and ensure_exprs else result
+    for i, expr in enumerate(ensure_exprs):
         try:
-            fn = compile_ensure(expr)
-            if not fn(result):
+            fn = compiled_ensures[i] if compiled_ensures is not None else compile_ensure(expr)
+            if not fn(result_ns):
                 violations.append(f"ensure '{expr}' failed")
         except EnsureCompileError as exc:
             violations.append(str(exc))
 
-    dispatched = state.dispatched_at.get(step_id, state.flow_start)
-    duration_ms = int((time.monotonic() - dispatched) * 1000)
+    duration_ms = _step_duration_ms(state, idx)
 
     if violations:
         if attempt >= max_retries:
@@ -1228,7 +1627,7 @@ def resolve_gate(
             })
 
         # Archive current active records (including the GateRecord just appended)
-        state.rounds.append([dataclasses.asdict(r) for r in state.records])
+        state.rounds.append(_records_as_dicts(state))
 
         # Archive current-round iteration data (parallel to rounds[])
         state.archived_iterations.append(state.iterations)
@@ -1317,7 +1716,7 @@ def apply_gate_policy(
             "status": "complete",
             "flow_id": state.flow_id,
             "output": output,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
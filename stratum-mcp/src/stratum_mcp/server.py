@@ -1,19 +1,20 @@
 """FastMCP server entry point. MCP controller: plan management, step tracking, audit."""
 from __future__ import annotations
 
-import dataclasses
+import asyncio
 import json
+import os
 import sys
 import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable
 
-from mcp.server.fastmcp import FastMCP, Context
-
-from .errors import IRParseError, IRValidationError, IRSemanticError, MCPExecutionError, exception_to_mcp_error
+from .errors import IR_ERRORS, MCPExecutionError, exception_to_mcp_error
 from .executor import (
     FlowState,
     _flows,
+    _record_to_dict,
+    _records_as_dicts,
     _step_mode,
     create_flow_state,
     get_current_step_info,
@@ -32,14 +33,52 @@ from .executor import (
 )
 from .spec import parse_and_validate
 
-mcp = FastMCP(
-    "stratum-mcp",
-    instructions=(
-        "Stratum execution controller for Claude Code. "
-        "Validates .stratum.yaml IR specs, manages flow execution state, "
-        "and tracks step results with ensure postcondition enforcement."
-    ),
-)
+if TYPE_CHECKING:
+    from mcp.server.fastmcp import Context, FastMCP
+
+# The MCP SDK is the bulk of import time and only the stdio server needs it, so
+# tools are collected here and the FastMCP instance is built on first access to
+# `server.mcp`. CLI subcommands (install, query, gate, ...) never pay for it.
+_TOOLS: list[tuple[Callable[..., Any], str]] = []
+_server: FastMCP | None = None
+
+
+def _tool(description: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def register(fn: Callable[..., Any]) -> Callable[..., Any]:
+        _TOOLS.append((fn, description))
+        return fn
+    return register
+
+
+def _build_server() -> FastMCP:
+    global _server
+    if _server is None:
+        from mcp.server.fastmcp import Context, FastMCP
+        # Required, not cosmetic. Under `from __future__ import annotations` every
+        # tool's `ctx: Context` is a string, and FastMCP evaluates it against this
+        # module's globals when the tool is registered; without a module-level
+        # Context, registration fails with InvalidSignature. Context cannot be
+        # imported at module top without defeating the lazy SDK import, so it is
+        # bound here, before the first server.tool() call below.
+        globals()["Context"] = Context
+        server = FastMCP(
+            "stratum-mcp",
+            instructions=(
+                "Stratum execution controller for Claude Code. "
+                "Validates .stratum.yaml IR specs, manages flow execution state, "
+                "and tracks step results with ensure postcondition enforcement."
+            ),
+        )
+        for fn, description in _TOOLS:
+            server.tool(description=description)(fn)
+        _server = server
+    return _server
+
+
+def __getattr__(name: str) -> Any:
+    if name == "mcp":
+        return _build_server()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _apply_policy_loop(
@@ -64,20 +103,20 @@ def _apply_policy_loop(
     return step_info
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Validate a .stratum.yaml IR spec. "
     "Input: spec (str) — inline YAML only, not a file path. "
     "Returns {valid: bool, errors: list}."
 ))
 async def stratum_validate(spec: str, ctx: Context) -> dict[str, Any]:
     try:
-        parse_and_validate(spec)
+        await asyncio.to_thread(parse_and_validate, spec)
         return {"valid": True, "errors": []}
-    except (IRParseError, IRValidationError, IRSemanticError) as exc:
+    except IR_ERRORS as exc:
         return {"valid": False, "errors": [exception_to_mcp_error(exc)]}
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Create an execution plan from a validated .stratum.yaml spec. "
     "Inputs: spec (str, inline YAML), flow (str, flow name), inputs (dict, flow-level inputs). "
     "Returns the first step to execute with resolved inputs and output contract details. "
@@ -89,13 +128,17 @@ async def stratum_plan(
     inputs: dict[str, Any],
     ctx: Context,
 ) -> dict[str, Any]:
+    # Parsing, validation and step precompilation touch no shared flow state, so
+    # they run on a worker thread and keep the stdio loop responsive. Steps that
+    # mutate a FlowState (process_step_result etc.) stay on the loop, which is
+    # what serializes concurrent calls against the same flow.
     try:
-        ir_spec = parse_and_validate(spec)
-    except (IRParseError, IRValidationError, IRSemanticError) as exc:
+        ir_spec = await asyncio.to_thread(parse_and_validate, spec)
+    except IR_ERRORS as exc:
         return {"status": "error", **exception_to_mcp_error(exc)}
 
     try:
-        state = create_flow_state(ir_spec, flow, inputs, raw_spec=spec)
+        state = await asyncio.to_thread(create_flow_state, ir_spec, flow, inputs, raw_spec=spec)
     except MCPExecutionError as exc:
         return {"status": "error", **exception_to_mcp_error(exc)}
 
@@ -112,7 +155,7 @@ async def stratum_plan(
     return step_info  # always non-None: schema enforces minItems: 1
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Resume an in-progress flow. Loads the persisted flow state and returns "
     "the current step dispatch (execute_step, await_gate, execute_flow, or "
     "flow completion). Use this instead of stratum_plan when a flow_id already "
@@ -148,7 +191,7 @@ async def stratum_resume(flow_id: str, ctx: Context) -> dict[str, Any]:
     return step_info
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Report a completed step result. "
     "Inputs: flow_id (str), step_id (str), result (dict matching the step's output contract). "
     "Checks ensure postconditions. Returns next step to execute, ensure failure with retry "
@@ -160,17 +203,92 @@ async def stratum_step_done(
     result: dict[str, Any],
     ctx: Context,
 ) -> dict[str, Any]:
-    state = _flows.get(flow_id)
+    state = _lookup_flow(flow_id)
     if state is None:
-        state = restore_flow(flow_id)
-        if state is None:
+        return _flow_not_found(flow_id)
+
+    return _process_one(state, step_id, result)
+
+
+@_tool(description=(
+    "Report several completed step results in one call. "
+    "Inputs: flow_id (str), results (ordered list of {step_id, result}). "
+    "All entries are checked first; a malformed entry rejects the whole batch unapplied. "
+    "Each entry is processed exactly as stratum_step_done would, stopping at the first "
+    "response that is not a plain execute_step dispatch (ensure failure, gate, flow "
+    "completion, error, ...). Returns that response with processed (list of step_ids) "
+    "and remaining (indices of entries not processed)."
+))
+async def stratum_step_done_batch(
+    flow_id: str,
+    results: list[dict[str, Any]],
+    ctx: Context,
+) -> dict[str, Any]:
+    state = _lookup_flow(flow_id)
+    if state is None:
+        return _flow_not_found(flow_id)
+
+    if not results:
+        return {
+            "status": "error",
+            "error_type": "empty_batch",
+            "message": "results must contain at least one {step_id, result} entry",
+        }
+
+    # Validate every entry before processing any, so a malformed entry anywhere
+    # in the batch leaves the flow untouched.
+    for i, item in enumerate(results):
+        if (
+            not isinstance(item, dict)
+            or not isinstance(item.get("step_id"), str)
+            or not isinstance(item.get("result"), dict)
+        ):
             return {
                 "status": "error",
-                "error_type": "flow_not_found",
-                "message": f"No active flow with id '{flow_id}'",
+                "error_type": "invalid_batch_item",
+                "message": f"results[{i}] must be an object with a string step_id and an object result",
+                "processed": [],
+                "remaining": list(range(len(results))),
             }
-        _flows[flow_id] = state
 
+    processed: list[str] = []
+    response: dict[str, Any] = {}
+    for item in results:
+        response = _process_one(state, item["step_id"], item["result"])
+        processed.append(item["step_id"])
+        if response.get("status") != "execute_step":
+            break
+    return {
+        **response,
+        "processed": processed,
+        "remaining": list(range(len(processed), len(results))),
+    }
+
+
+def _lookup_flow(flow_id: str) -> FlowState | None:
+    """Return the live FlowState for flow_id, restoring it from disk if needed."""
+    state = _flows.get(flow_id)
+    if state is None:
+        state = restore_flow(flow_id)
+        if state is not None:
+            _flows[flow_id] = state
+    return state
+
+
+def _flow_not_found(flow_id: str) -> dict[str, Any]:
+    return {
+        "status": "error",
+        "error_type": "flow_not_found",
+        "message": f"No active flow with id '{flow_id}'",
+    }
+
+
+def _process_one(state: FlowState, step_id: str, result: Any) -> dict[str, Any]:
+    """Process one step result against state and return the next dispatch.
+
+    Shared by stratum_step_done and stratum_step_done_batch.
+    """
+    flow_id = state.flow_id
     # Gate step rejection: must not process gate steps through stratum_step_done.
     # This check fires before process_step_result so no state is mutated on rejection.
     if state.current_idx < len(state.ordered_steps):
@@ -296,7 +414,7 @@ async def stratum_step_done(
             "status": state.terminal_status or "complete",
             "flow_id": state.flow_id,
             "output": output,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -304,7 +422,7 @@ async def stratum_step_done(
     return next_step
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Report results for a completed parallel_dispatch step. "
     "Inputs: flow_id (str), step_id (str), "
     "task_results (list of {task_id, result, status}), "
@@ -514,7 +632,7 @@ async def stratum_parallel_done(
             "status": state.terminal_status or "complete",
             "flow_id": state.flow_id,
             "output": output,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -522,12 +640,19 @@ async def stratum_parallel_done(
     return next_step
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Return execution trace for a flow. "
-    "Input: flow_id (str) from stratum_plan. "
+    "Input: flow_id (str) from stratum_plan; optional since (int) — when polling, pass "
+    "the trace length already seen to receive only newer entries. "
     "Returns step-by-step trace with attempt counts and durations."
 ))
-async def stratum_audit(flow_id: str, ctx: Context) -> dict[str, Any]:
+async def stratum_audit(flow_id: str, ctx: Context, since: int = 0) -> dict[str, Any]:
+    if since < 0:
+        return {
+            "status": "error",
+            "error_type": "invalid_since",
+            "message": f"since must be a non-negative trace length, got {since}",
+        }
     state = _flows.get(flow_id)
     if state is None:
         state = restore_flow(flow_id)
@@ -539,14 +664,18 @@ async def stratum_audit(flow_id: str, ctx: Context) -> dict[str, Any]:
             }
         _flows[flow_id] = state
 
-    return _build_audit_snapshot(state)
+    snapshot = _build_audit_snapshot(state, since)
+    if since > 0:
+        snapshot["trace_since"] = since
+    return snapshot
 
 
-def _build_audit_snapshot(state: FlowState) -> dict[str, Any]:
+def _build_audit_snapshot(state: FlowState, since: int = 0) -> dict[str, Any]:
     """Build a full audit snapshot from a FlowState.
 
     Used by stratum_audit and by flow composition to capture child flow audits
-    before deletion.
+    before deletion. With since > 0 the trace holds only records from that index
+    on, and earlier records are never converted, so a poll costs O(new records).
     """
     total_ms = int((time.monotonic() - state.flow_start) * 1000)
     is_complete = state.current_idx >= len(state.ordered_steps)
@@ -564,7 +693,13 @@ def _build_audit_snapshot(state: FlowState) -> dict[str, Any]:
         "status": flow_status,
         "steps_completed": len(state.records),
         "total_steps": len(state.ordered_steps),
-        "trace": [dataclasses.asdict(r) for r in state.records],
+        # The trace only grows between checkpoint reverts, so a poller needs just the
+        # tail. steps_completed still counts every record: a value below `since`
+        # tells the poller the trace was rewound and it should re-read from 0.
+        "trace": (
+            [_record_to_dict(r) for r in state.records[since:]]
+            if since > 0 else _records_as_dicts(state)
+        ),
         "total_duration_ms": total_ms,
         "round": state.round,
         "rounds": [{"round": i, "steps": r} for i, r in enumerate(state.rounds)],
@@ -589,7 +724,7 @@ def _build_audit_snapshot(state: FlowState) -> dict[str, Any]:
     }
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Resolve a gate step in a flow (IR v0.2). "
     "Inputs: flow_id (str), step_id (str, must be the current gate step), "
     "outcome (str: 'approve' | 'revise' | 'kill'), "
@@ -652,7 +787,7 @@ async def stratum_gate_resolve(
             "status": "complete",
             "flow_id": flow_id,
             "output": output,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -662,7 +797,7 @@ async def stratum_gate_resolve(
         return {
             "status": "killed",
             "flow_id": flow_id,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -682,7 +817,7 @@ async def stratum_gate_resolve(
     return next_step
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Check whether any pending gate step in a flow has exceeded its timeout (IR v0.2). "
     "Input: flow_id (str). "
     "If the current gate step has a timeout configured and the timeout has expired, "
@@ -741,7 +876,7 @@ async def stratum_check_timeouts(flow_id: str, ctx: Context) -> dict[str, Any]:
             "status": "killed",
             "flow_id": flow_id,
             "reason": "timeout",
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -757,7 +892,7 @@ async def stratum_check_timeouts(flow_id: str, ctx: Context) -> dict[str, Any]:
     return {"status": "error", "message": f"Unexpected gate result: {result_status}"}
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Explicitly skip the current step in a flow. "
     "Inputs: flow_id (str), step_id (str, must be the current step), "
     "reason (str, recorded in audit trail). "
@@ -807,7 +942,7 @@ async def stratum_skip_step(
             "status": state.terminal_status or "complete",
             "flow_id": state.flow_id,
             "output": output,
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
@@ -819,7 +954,7 @@ async def stratum_skip_step(
 # Per-step iteration tools (STRAT-ENG-4)
 # ---------------------------------------------------------------------------
 
-@mcp.tool(description=(
+@_tool(description=(
     "Start an iteration loop on the current step. "
     "Inputs: flow_id (str), step_id (str, must be the current step). "
     "The step must have max_iterations defined in the spec. "
@@ -849,7 +984,7 @@ async def stratum_iteration_start(
     return result
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Report one iteration result. Evaluates exit_criterion, increments count, "
     "checks max_iterations. "
     "Inputs: flow_id (str), step_id (str), result (dict). "
@@ -880,7 +1015,7 @@ async def stratum_iteration_report(
     return response
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Abort an active iteration loop before completion. "
     "Inputs: flow_id (str), step_id (str), reason (str). "
     "Returns iteration_aborted with the current count."
@@ -910,7 +1045,7 @@ async def stratum_iteration_abort(
     return response
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Save a named checkpoint of the current flow state. "
     "Inputs: flow_id (str), label (str, e.g. 'after_analysis'). "
     "Snapshots step_outputs, attempts, records, and current_idx under the label. "
@@ -953,7 +1088,7 @@ async def stratum_commit(flow_id: str, label: str, ctx: Context) -> dict[str, An
     }
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Roll back flow state to a previously committed checkpoint. "
     "Inputs: flow_id (str), label (str, must match a prior stratum_commit label). "
     "Restores step_outputs, attempts, records, and current_idx to the checkpoint. "
@@ -991,14 +1126,14 @@ async def stratum_revert(flow_id: str, label: str, ctx: Context) -> dict[str, An
             "status": "complete",
             "flow_id": state.flow_id,
             "output": state.step_outputs.get(last_step.id),
-            "trace": [dataclasses.asdict(r) for r in state.records],
+            "trace": _records_as_dicts(state),
             "total_duration_ms": total_ms,
         }
 
     return {**next_step, "reverted_to": label}
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Compile a spec-kit tasks directory into a .stratum.yaml flow. "
     "Input: tasks_dir (str, path to a directory containing *.md task files), "
     "flow_name (str, optional, name for the generated flow, default 'tasks'). "
@@ -1059,7 +1194,7 @@ async def stratum_compile_speckit(
     }
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "Push a pipeline draft to the PipelineEditor UI. "
     "The draft is written to {project_dir}/.stratum/pipeline-draft.json, "
     "which the PipelineEditor polls and will display automatically. "
@@ -1091,7 +1226,7 @@ async def stratum_draft_pipeline(
     return {"status": "saved", "path": str(draft_path)}
 
 
-@mcp.tool(description=(
+@_tool(description=(
     "List registered workflow specs from a directory. "
     "Scans for *.stratum.yaml files with a workflow: block. "
     "Returns {workflows: [{name, description, input, path}], errors: [str]}."
@@ -1166,6 +1301,31 @@ _HOOK_SCRIPTS: dict[str, str] = {
 
 
 _STRATUM_HOOKS_DIR = Path.home() / ".stratum" / "hooks"
+_SKILLS_HOME = Path.home() / ".claude" / "skills"
+
+
+def _package_skills() -> list[Path]:
+    """Skill directories bundled with the package, sorted by name.
+
+    One scandir pass: DirEntry.is_dir() answers from the directory listing
+    on most platforms, where Path.iterdir() + is_dir() stats every entry.
+    """
+    pkg_skills = Path(__file__).parent / "skills"
+    try:
+        with os.scandir(pkg_skills) as entries:
+            return sorted(Path(e.path) for e in entries if e.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def _file_equals(path: Path, content: bytes) -> bool:
+    """True if path exists and holds exactly content. A size mismatch skips the read."""
+    try:
+        if path.stat().st_size != len(content):
+            return False
+        return path.read_bytes() == content
+    except OSError:
+        return False
 
 
 def _install_hooks(root: Path, changed: list[str]) -> None:
@@ -1180,12 +1340,12 @@ def _install_hooks(root: Path, changed: list[str]) -> None:
         dst = _STRATUM_HOOKS_DIR / script_name
         if not src.exists():
             continue
-        content = src.read_text()
-        if dst.exists() and dst.read_text() == content:
+        content = src.read_bytes()
+        if _file_equals(dst, content):
             print(f"  ~/.stratum/hooks/{script_name}: already up to date — skipped")
         else:
             verb = "updated" if dst.exists() else "installed"
-            dst.write_text(content)
+            dst.write_bytes(content)
             dst.chmod(0o755)
             print(f"  ~/.stratum/hooks/{script_name}: {verb}")
             changed.append(f"~/.stratum/hooks/{script_name}")
@@ -1313,17 +1473,23 @@ def _remove_hooks(root: Path, removed: list[str]) -> None:
         print("  .claude/settings.json: no Stratum hook entries found — skipped")
 
 
-def _cmd_setup() -> None:
-    """Write .claude/mcp.json and append Stratum block to CLAUDE.md."""
+def _project_root(start: Path | None = None) -> Path:
+    """Nearest directory at or above start (default cwd) holding .git or CLAUDE.md; start if none."""
+    start = Path.cwd() if start is None else start
+    for candidate in (start, *start.parents):
+        if (candidate / ".git").exists() or (candidate / "CLAUDE.md").exists():
+            return candidate
+    return start
+
+
+def _cmd_setup(root: Path | None = None) -> None:
+    """Write .claude/mcp.json and append Stratum block to CLAUDE.md.
+
+    root defaults to the project root found from cwd.
+    """
     import json
-    from pathlib import Path
 
-    # Walk up from cwd to find project root (nearest .git or CLAUDE.md)
-    root = Path.cwd()
-    for candidate in [root, *root.parents]:
-        if (candidate / ".git").exists() or (candidate / "CLAUDE.md").exists():
-            root = candidate
-            break
+    root = _project_root() if root is None else root
 
     changed: list[str] = []
 
@@ -1368,26 +1534,22 @@ def _cmd_setup() -> None:
         changed.append("CLAUDE.md")
 
     # --- Skills ---
-    skills_home = Path.home() / ".claude" / "skills"
-    pkg_skills = Path(__file__).parent / "skills"
-    if pkg_skills.is_dir():
-        for skill_dir in sorted(pkg_skills.iterdir()):
-            if not skill_dir.is_dir():
-                continue
-            src = skill_dir / "SKILL.md"
-            if not src.exists():
-                continue
-            dest_dir = skills_home / skill_dir.name
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            dest = dest_dir / "SKILL.md"
-            content = src.read_text()
-            if dest.exists() and dest.read_text() == content:
-                print(f"  ~/.claude/skills/{skill_dir.name}: already up to date — skipped")
-            else:
-                dest.write_text(content)
-                verb = "updated" if dest.exists() else "installed"
-                print(f"  ~/.claude/skills/{skill_dir.name}: {verb}")
-                changed.append(f"skills/{skill_dir.name}")
+    skills_home = _SKILLS_HOME
+    for skill_dir in _package_skills():
+        src = skill_dir / "SKILL.md"
+        if not src.exists():
+            continue
+        dest_dir = skills_home / skill_dir.name
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dest = dest_dir / "SKILL.md"
+        content = src.read_bytes()
+        if _file_equals(dest, content):
+            print(f"  ~/.claude/skills/{skill_dir.name}: already up to date — skipped")
+        else:
+            verb = "updated" if dest.exists() else "installed"
+            dest.write_bytes(content)
+            print(f"  ~/.claude/skills/{skill_dir.name}: {verb}")
+            changed.append(f"skills/{skill_dir.name}")
 
     # --- Hooks ---
     _install_hooks(root, changed)
@@ -1398,16 +1560,14 @@ def _cmd_setup() -> None:
         print("\nAlready configured — nothing to do.")
 
 
-def _cmd_uninstall(keep_skills: bool = False) -> None:
-    """Remove Stratum config from the project and optionally from ~/.claude/skills/."""
+def _cmd_uninstall(keep_skills: bool = False, root: Path | None = None) -> None:
+    """Remove Stratum config from the project and optionally from ~/.claude/skills/.
+
+    root defaults to the project root found from cwd.
+    """
     import json
-    from pathlib import Path
 
-    root = Path.cwd()
-    for candidate in [root, *root.parents]:
-        if (candidate / ".git").exists() or (candidate / "CLAUDE.md").exists():
-            root = candidate
-            break
+    root = _project_root() if root is None else root
 
     removed: list[str] = []
 
@@ -1456,25 +1616,21 @@ def _cmd_uninstall(keep_skills: bool = False) -> None:
     if keep_skills:
         print("  ~/.claude/skills/stratum-*: kept (--keep-skills)")
     else:
-        skills_home = Path.home() / ".claude" / "skills"
-        pkg_skills = Path(__file__).parent / "skills"
-        if pkg_skills.is_dir():
-            for skill_dir in sorted(pkg_skills.iterdir()):
-                if not skill_dir.is_dir():
-                    continue
-                dest = skills_home / skill_dir.name / "SKILL.md"
-                dest_dir = skills_home / skill_dir.name
-                if dest.exists():
-                    dest.unlink()
-                    # Remove the directory if now empty
-                    try:
-                        dest_dir.rmdir()
-                    except OSError:
-                        pass
-                    print(f"  ~/.claude/skills/{skill_dir.name}: removed")
-                    removed.append(f"skills/{skill_dir.name}")
-                else:
-                    print(f"  ~/.claude/skills/{skill_dir.name}: not found — skipped")
+        skills_home = _SKILLS_HOME
+        for skill_dir in _package_skills():
+            dest = skills_home / skill_dir.name / "SKILL.md"
+            dest_dir = skills_home / skill_dir.name
+            if dest.exists():
+                dest.unlink()
+                # Remove the directory if now empty
+                try:
+                    dest_dir.rmdir()
+                except OSError:
+                    pass
+                print(f"  ~/.claude/skills/{skill_dir.name}: removed")
+                removed.append(f"skills/{skill_dir.name}")
+            else:
+                print(f"  ~/.claude/skills/{skill_dir.name}: not found — skipped")
 
     # --- Hooks ---
     _remove_hooks(root, removed)
@@ -1609,7 +1765,7 @@ def _query_flow(flow_id: str) -> dict:
         "step_count":       len(state.ordered_steps),
         "terminal_status":  state.terminal_status,
         "step_outputs":     state.step_outputs,
-        "records":          [dataclasses.asdict(r) for r in state.records],
+        "records":          _records_as_dicts(state),
         "rounds":           state.rounds,
         "ordered_steps":    [
             {
@@ -1791,7 +1947,7 @@ def main() -> None:
         print("Run 'stratum-mcp --help' for usage.", file=sys.stderr)
         sys.exit(1)
 
-    mcp.run(transport="stdio")
+    _build_server().run(transport="stdio")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 """IR types, JSON Schema registry, parser, and validator for .stratum.yaml v0.1/v0.2/v0.3."""
 from __future__ import annotations
 
+import hashlib
+import json
 import re
+import sys
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Literal
+from typing import Any, Callable, Literal
 
 import yaml
 from jsonschema import Draft202012Validator
@@ -11,6 +16,12 @@ from jsonschema.exceptions import best_match
 
 from .errors import IRParseError, IRValidationError, IRSemanticError
 
+# libyaml-backed loader when PyYAML was built with it; same safe tag set either way.
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # pragma: no cover — PyYAML without libyaml
+    from yaml import SafeLoader as _SafeLoader  # type: ignore[assignment]
+
 
 # ---------------------------------------------------------------------------
 # IR dataclasses (frozen)
@@ -22,19 +33,19 @@ from .errors import IRParseError, IRValidationError, IRSemanticError
 # types.MappingProxyType for true deep immutability.
 # ---------------------------------------------------------------------------
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRBudgetDef:
     ms: int | None = None
     usd: float | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRContractDef:
     name: str
     fields: dict[str, Any]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRFunctionDef:
     name: str
     mode: Literal["infer", "compute", "gate"]
@@ -53,7 +64,7 @@ class IRFunctionDef:
     guardrails: list[str] = field(default_factory=list)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRStepDef:
     id: str
     # v0.2: function is optional — inline steps use intent, composed steps use flow_ref
@@ -106,7 +117,7 @@ class IRStepDef:
     intent_template: str | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRFlowDef:
     name: str
     input_schema: dict[str, Any]
@@ -117,7 +128,7 @@ class IRFlowDef:
     max_rounds: int | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRWorkflowDef:
     """v0.2 STRAT-ENG-1: self-registering workflow declaration."""
     name: str
@@ -125,7 +136,7 @@ class IRWorkflowDef:
     input_schema: dict[str, Any]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IRSpec:
     version: str
     contracts: dict[str, IRContractDef]
@@ -541,21 +552,76 @@ SCHEMAS: dict[str, dict] = {
 # Public parse entry point
 # ---------------------------------------------------------------------------
 
+def _inline_refs(node: Any, defs: dict[str, Any], seen: tuple[str, ...] = ()) -> Any:
+    """Return a copy of a schema with every local ``#/$defs/X`` ref expanded in place.
+
+    The IR schemas are static and non-recursive, so this partial evaluation is
+    exact. It spares jsonschema a referencing lookup per $ref per instance node —
+    roughly a third of validation time on specs with many steps.
+    """
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/$defs/") and len(node) == 1:
+            name = ref[len("#/$defs/"):]
+            if name in seen:
+                raise ValueError(f"recursive $ref cannot be inlined: {name}")
+            return _inline_refs(defs[name], defs, seen + (name,))
+        return {k: _inline_refs(v, defs, seen) for k, v in node.items() if k != "$defs"}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs, seen) for v in node]
+    return node
+
+
+# One validator per IR version, built at import from the ref-inlined schema.
+# SCHEMAS is static, so there is nothing to re-resolve per call. (check_schema
+# is left to the test suite: it costs ~50 ms at import.)
+_VALIDATORS: dict[str, Draft202012Validator] = {
+    version: Draft202012Validator(_inline_refs(schema, schema.get("$defs", {})))
+    for version, schema in SCHEMAS.items()
+}
+
+_SPEC_CACHE_MAX = 128
+_spec_cache: OrderedDict[bytes, IRSpec] = OrderedDict()
+_spec_cache_lock = threading.Lock()
+
+
 def parse_and_validate(raw_yaml: str) -> IRSpec:
     """
     Parse raw YAML → JSON Schema validation → semantic validation → IRSpec.
     Raises IRParseError, IRValidationError, or IRSemanticError.
+
+    Successful results are kept in a small LRU keyed by a blake2b digest of the
+    YAML text, so repeat stratum_plan/stratum_validate calls and restore_flow reuse
+    the same IRSpec without the cache pinning every spec's source text.
+    Failures are not cached.
     """
+    # surrogatepass: a lone surrogate is legal in a JSON-decoded MCP string and
+    # must reach the YAML loader, which rejects it as IRParseError.
+    key = hashlib.blake2b(raw_yaml.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _spec_cache_lock:
+        cached = _spec_cache.get(key)
+        if cached is not None:
+            _spec_cache.move_to_end(key)
+            return cached
+    spec = _parse_and_validate(raw_yaml)
+    with _spec_cache_lock:
+        _spec_cache[key] = spec
+        if len(_spec_cache) > _SPEC_CACHE_MAX:
+            _spec_cache.popitem(last=False)
+    return spec
+
+
+def _parse_and_validate(raw_yaml: str) -> IRSpec:
     doc = _parse_yaml(raw_yaml)
     version = str(doc.get("version", ""))
-    schema = SCHEMAS.get(version)
-    if schema is None:
+    validator = _VALIDATORS.get(version)
+    if validator is None:
         raise IRValidationError(
             path="version",
             message=f"Unknown IR version: {version!r}",
             suggestion=f"Use version: \"{list(SCHEMAS.keys())[-1]}\"",
         )
-    _validate_schema(doc, schema)
+    _validate_schema(doc, validator)
     spec = _build_spec(doc)
     _validate_semantics(spec)
     return spec
@@ -565,33 +631,73 @@ def _parse_yaml(raw: str) -> dict[str, Any]:
     if not raw or not raw.strip():
         raise IRParseError(raw_error="Empty or blank YAML input")
     try:
-        return yaml.safe_load(raw) or {}
+        try:
+            return yaml.load(raw, Loader=_SafeLoader) or {}
+        except UnicodeEncodeError:
+            # libyaml encodes to UTF-8 first and chokes on lone surrogates; the
+            # pure-Python loader reports them as a YAMLError with a position.
+            return yaml.load(raw, Loader=yaml.SafeLoader) or {}
     except yaml.YAMLError as exc:
         raise IRParseError(raw_error=str(exc)) from exc
 
 
-def _validate_schema(doc: dict, schema: dict) -> None:
-    validator = Draft202012Validator(schema)
-    errors = list(validator.iter_errors(doc))
-    if not errors:
+def _validate_schema(doc: dict, validator: Draft202012Validator) -> None:
+    if validator.is_valid(doc):
         return
-    worst = best_match(errors)
+    worst = best_match(validator.iter_errors(doc))
     path = ".".join(str(p) for p in worst.path) if worst.path else "root"
     suggestion = _suggest_fix(worst)
     raise IRValidationError(path=path, message=worst.message, suggestion=suggestion)
 
 
+# Process-wide interner for schema-like sub-dicts (contract fields, step
+# output_schema). Specs that differ elsewhere but repeat a schema share one dict,
+# which also lets executor._validator_for (keyed by schema identity) reuse its
+# compiled validator across specs. Plain dicts, not MappingProxyType: these are
+# emitted in JSON responses and handed to jsonschema. Never mutate them.
+_INTERN_MAX = 1024
+_interned: OrderedDict[str, dict] = OrderedDict()
+_intern_lock = threading.Lock()
+
+
+def _intern_dict(d: dict | None) -> dict | None:
+    if not d:
+        return d
+    try:
+        # Key order is part of the key: field order reaches agents via
+        # output_fields, so {b, a} must not collapse onto an earlier {a, b}.
+        key = json.dumps(d, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return d  # YAML-only scalars (dates, etc.) — leave unshared
+    with _intern_lock:
+        existing = _interned.get(key)
+        if existing is not None:
+            _interned.move_to_end(key)
+            return existing
+        _interned[key] = d
+        if len(_interned) > _INTERN_MAX:
+            _interned.popitem(last=False)
+    return d
+
+
+def _intern_str(value: Any) -> Any:
+    # Names and modes recur across every spec a long-lived server parses; interning
+    # makes them one shared object each and lets equality checks short-circuit on
+    # identity. Non-str values (schema-invalid YAML keys) pass through untouched.
+    return sys.intern(value) if type(value) is str else value
+
+
 def _build_spec(doc: dict) -> IRSpec:
     contracts = {
-        name: IRContractDef(name=name, fields=fields)
+        _intern_str(name): IRContractDef(name=_intern_str(name), fields=_intern_dict(fields))
         for name, fields in (doc.get("contracts") or {}).items()
     }
     functions = {
-        name: _build_function(name, d)
+        _intern_str(name): _build_function(_intern_str(name), d)
         for name, d in (doc.get("functions") or {}).items()
     }
     flows = {
-        name: _build_flow(name, d)
+        _intern_str(name): _build_flow(_intern_str(name), d)
         for name, d in (doc.get("flows") or {}).items()
     }
     wf = doc.get("workflow")
@@ -614,10 +720,10 @@ def _build_function(name: str, d: dict) -> IRFunctionDef:
     budget = IRBudgetDef(ms=b.get("ms"), usd=b.get("usd")) if b else None
     return IRFunctionDef(
         name=name,
-        mode=d["mode"],
+        mode=_intern_str(d["mode"]),
         intent=d.get("intent", ""),           # empty for gate functions
         input_schema=d.get("input", {}),
-        output_contract=d.get("output", ""),  # empty for gate functions
+        output_contract=_intern_str(d.get("output", "")),  # empty for gate functions
         ensure=d.get("ensure", []),
         budget=budget,
         retries=d.get("retries", 3),
@@ -635,7 +741,7 @@ def _build_flow(name: str, d: dict) -> IRFlowDef:
     return IRFlowDef(
         name=name,
         input_schema=d.get("input", {}),
-        output_contract=d.get("output", ""),  # empty string when no output declared
+        output_contract=_intern_str(d.get("output", "")),  # empty string when no output declared
         budget=budget,
         steps=steps,
         max_rounds=d.get("max_rounds"),
@@ -651,11 +757,11 @@ def _build_step(s: dict) -> IRStepDef:
     if step_type == "parallel_dispatch" and max_concurrent is None:
         max_concurrent = 3
     return IRStepDef(
-        id=s["id"],
-        function=s.get("function", ""),
+        id=_intern_str(s["id"]),
+        function=_intern_str(s.get("function", "")),
         inputs=s.get("inputs", {}),
         depends_on=s.get("depends_on", []),
-        output_schema=s.get("output_schema"),
+        output_schema=_intern_dict(s.get("output_schema")),
         on_approve=s.get("on_approve"),
         on_revise=s.get("on_revise"),
         on_kill=s.get("on_kill"),
@@ -735,10 +841,16 @@ def _check_recursive_flow_refs(spec: IRSpec, flow_name: str, step_flow_ref: str)
                     queue.append(s.flow_ref)
 
 
+# Fields only valid on parallel_dispatch steps (checked against decompose and legacy steps).
+_PARALLEL_DISPATCH_ONLY = ("source", "isolation", "require", "merge")
+_PARALLEL_DISPATCH_ONLY_WITH_TEMPLATE = (*_PARALLEL_DISPATCH_ONLY, "intent_template")
+
+
 def _validate_semantics(spec: IRSpec) -> None:
-    known_contracts = set(spec.contracts)
-    known_functions = set(spec.functions)
-    known_flow_names = set(spec.flows)
+    # Key views give O(1) membership without copying the spec's dicts into sets.
+    known_contracts = spec.contracts.keys()
+    known_functions = spec.functions.keys()
+    known_flow_names = spec.flows.keys()
 
     # --- Function-level validation (unchanged) ---
     for fn_name, fn in spec.functions.items():
@@ -816,14 +928,11 @@ def _validate_semantics(spec: IRSpec) -> None:
                 f"Flow '{flow_name}' output contract '{flow.output_contract}' not defined",
                 path=f"flows.{flow_name}.output"
             )
-        known_step_ids = {step.id for step in flow.steps}
+        known_step_ids = frozenset(step.id for step in flow.steps)
         topo_pos = _topo_positions(flow.steps)
 
         for step in flow.steps:
             # --- v0.3 STRAT-PAR: decompose / parallel_dispatch validation ---
-            _parallel_dispatch_only = (
-                "source", "isolation", "require", "merge",
-            )
             if step.step_type in ("decompose", "parallel_dispatch"):
                 if step.step_type == "decompose":
                     # decompose needs agent and intent (agent-executed step that produces TaskGraph)
@@ -849,7 +958,7 @@ def _validate_semantics(spec: IRSpec) -> None:
                             path=f"flows.{flow_name}.steps.{step.id}.intent_template"
                         )
                     # parallel_dispatch-only fields forbidden on decompose
-                    for pf in _parallel_dispatch_only:
+                    for pf in _PARALLEL_DISPATCH_ONLY:
                         if getattr(step, pf) is not None:
                             raise IRSemanticError(
                                 f"Step '{step.id}' has '{pf}' but is not a parallel_dispatch step",
@@ -886,7 +995,7 @@ def _validate_semantics(spec: IRSpec) -> None:
                 )
 
             # --- v0.3: parallel_dispatch-only fields forbidden on legacy step types ---
-            for pf in (*_parallel_dispatch_only, "intent_template"):
+            for pf in _PARALLEL_DISPATCH_ONLY_WITH_TEMPLATE:
                 if getattr(step, pf) is not None:
                     raise IRSemanticError(
                         f"Step '{step.id}' has '{pf}' but is not a parallel_dispatch step",
@@ -1094,13 +1203,14 @@ def _validate_semantics(spec: IRSpec) -> None:
                     )
 
 
+_SUGGESTIONS: dict[str, Callable[[Any], str]] = {
+    "enum": lambda e: f"Allowed values: {e.validator_value}",
+    "required": lambda e: f"Add required field(s): {e.validator_value}",
+    "additionalProperties": lambda e: "Remove unrecognised fields",
+    "const": lambda e: f"Expected: {e.validator_value!r}",
+}
+
+
 def _suggest_fix(error: Any) -> str:
-    if error.validator == "enum":
-        return f"Allowed values: {error.validator_value}"
-    if error.validator == "required":
-        return f"Add required field(s): {error.validator_value}"
-    if error.validator == "additionalProperties":
-        return "Remove unrecognised fields"
-    if error.validator == "const":
-        return f"Expected: {error.validator_value!r}"
-    return "See IR schema documentation"
+    suggest = _SUGGESTIONS.get(error.validator)
+    return suggest(error) if suggest is not None else "See IR schema documentation"
@@ -48,3 +48,12 @@ def test_unknown_exception_maps_to_internal_error():
     assert err["error_type"] == "internal_error"
     assert "boom" not in err["message"]  # must not leak internals
     assert err["success"] is False
+
+
+def test_error_subclass_maps_like_its_base():
+    class StaleFlowError(MCPExecutionError):
+        pass
+
+    err = exception_to_mcp_error(StaleFlowError("flow gone"))
+    assert err["error_type"] == "execution_error"
+    assert err["message"] == "flow gone"
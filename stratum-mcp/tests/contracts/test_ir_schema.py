@@ -36,6 +36,128 @@ def test_valid_ir_parses():
     assert "SentimentResult" in spec.contracts
 
 
+def test_yaml_loader_prefers_libyaml_and_matches_pure_python():
+    import yaml
+    from stratum_mcp.spec import _SafeLoader
+    if hasattr(yaml, "CSafeLoader"):
+        assert _SafeLoader is yaml.CSafeLoader
+    tricky = VALID_IR + 'x_flags: [yes, no, on, "off", 0o17, 1_000, 2026-01-02, ~, .inf]\n'
+    assert yaml.load(tricky, Loader=_SafeLoader) == yaml.load(tricky, Loader=yaml.SafeLoader)
+
+
+def test_registered_ir_schemas_are_valid_json_schema():
+    from jsonschema import Draft202012Validator
+    from stratum_mcp.spec import SCHEMAS, _VALIDATORS
+    assert set(_VALIDATORS) == set(SCHEMAS)
+    for schema in SCHEMAS.values():
+        Draft202012Validator.check_schema(schema)
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda d: d,
+    lambda d: d["functions"]["classify"].update(mode="bogus"),
+    lambda d: d["functions"]["classify"].pop("intent"),
+    lambda d: d["flows"]["run"]["steps"][0].update(extra=1),
+    lambda d: d["flows"]["run"].update(steps=[]),
+])
+def test_ref_inlined_validators_report_same_errors(mutate):
+    import yaml
+    from jsonschema import Draft202012Validator
+    from jsonschema.exceptions import best_match
+    from stratum_mcp.spec import SCHEMAS, _VALIDATORS
+    doc = yaml.safe_load(VALID_IR)
+    mutate(doc)
+    for version, schema in SCHEMAS.items():
+        doc["version"] = version
+        reference = best_match(Draft202012Validator(schema).iter_errors(doc))
+        inlined = best_match(_VALIDATORS[version].iter_errors(doc))
+        if reference is None:
+            assert inlined is None
+            continue
+        assert (list(inlined.path), inlined.message, inlined.validator) == (
+            list(reference.path), reference.message, reference.validator
+        )
+
+
+@pytest.mark.parametrize("keyword, value, expected", [
+    ("enum", ["infer", "compute"], "Allowed values: ['infer', 'compute']"),
+    ("required", ["intent"], "Add required field(s): ['intent']"),
+    ("additionalProperties", False, "Remove unrecognised fields"),
+    ("const", "0.1", "Expected: '0.1'"),
+    ("minItems", 1, "See IR schema documentation"),
+])
+def test_suggest_fix_by_failing_keyword(keyword, value, expected):
+    from types import SimpleNamespace
+    from stratum_mcp.spec import _suggest_fix
+    assert _suggest_fix(SimpleNamespace(validator=keyword, validator_value=value)) == expected
+
+
+def test_parse_and_validate_reuses_spec_for_identical_yaml():
+    assert parse_and_validate(VALID_IR) is parse_and_validate(VALID_IR)
+    assert parse_and_validate(VALID_IR) is not parse_and_validate(VALID_IR + "\n")
+
+
+def test_identical_contract_fields_shared_across_specs():
+    a = parse_and_validate(VALID_IR)
+    b = parse_and_validate(VALID_IR.replace("Classify sentiment", "Classify tone"))
+    assert a is not b
+    assert a.contracts["SentimentResult"].fields is b.contracts["SentimentResult"].fields
+
+
+def test_contract_field_order_not_shared_across_specs():
+    swapped = VALID_IR.replace(
+        "    label: {type: string}\n    confidence: {type: number}\n",
+        "    confidence: {type: number}\n    label: {type: string}\n",
+    )
+    assert swapped != VALID_IR
+    a = parse_and_validate(VALID_IR)
+    b = parse_and_validate(swapped)
+    assert list(a.contracts["SentimentResult"].fields) == ["label", "confidence"]
+    assert list(b.contracts["SentimentResult"].fields) == ["confidence", "label"]
+
+
+def test_names_and_modes_interned_across_specs():
+    a = parse_and_validate(VALID_IR)
+    b = parse_and_validate(VALID_IR.replace("Classify sentiment", "Classify mood"))
+    fa, fb = a.functions["classify"], b.functions["classify"]
+    assert fa.mode is fb.mode and fa.output_contract is fb.output_contract
+    assert a.flows["run"].steps[0].id is b.flows["run"].steps[0].id
+    assert next(iter(a.functions)) is next(iter(b.functions))
+
+
+def test_ir_dataclasses_are_slotted():
+    spec = parse_and_validate(VALID_IR)
+    for obj in (spec, spec.functions["classify"], spec.contracts["SentimentResult"],
+                spec.flows["run"], spec.flows["run"].steps[0]):
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+
+
+def test_parse_and_validate_does_not_cache_failures():
+    bad = VALID_IR.replace("function: classify", "function: missing")
+    for _ in range(2):
+        with pytest.raises(IRSemanticError):
+            parse_and_validate(bad)
+
+
+def test_lone_surrogate_is_parse_error_not_encode_error():
+    # JSON-decoded MCP strings may carry lone surrogates; the cache key must not
+    # raise before the YAML loader reports them.
+    with pytest.raises(IRParseError):
+        parse_and_validate('version: "0.1"\nx: "\ud800"\n')
+
+
+def test_schema_invalid_spec_never_reaches_builder():
+    # Building assumes a schema-valid doc and interns contract fields, so it must
+    # not run (concurrently or otherwise) until schema validation has passed.
+    from stratum_mcp.spec import _interned
+    bad = VALID_IR.replace("label: {type: string}", "never_interned: {type: string}")
+    bad = bad.replace("mode: infer", "mode: bogus")
+    before = set(_interned)
+    with pytest.raises(IRValidationError):
+        parse_and_validate(bad)
+    assert not any("never_interned" in k for k in set(_interned) - before)
+
+
 def test_valid_ir_function_fields():
     spec = parse_and_validate(VALID_IR)
     fn = spec.functions["classify"]
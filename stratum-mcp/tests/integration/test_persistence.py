@@ -179,6 +179,21 @@ def test_restore_flow_resets_timing_fields(patch_flows_dir):
     assert before <= restored.flow_start <= after
 
 
+def test_restore_flow_rebuilds_per_step_tables(patch_flows_dir):
+    """Precompiled step tables are not persisted; restore rebuilds them aligned with ordered_steps."""
+    spec = parse_and_validate(TWO_STEP_IR)
+    state = create_flow_state(spec, "pipeline", {"text": "t"}, raw_spec=TWO_STEP_IR)
+    persist_flow(state)
+    payload = json.loads((patch_flows_dir / f"{state.flow_id}.json").read_text())
+    assert "step_ensures" not in payload
+
+    restored = restore_flow(state.flow_id)
+    assert restored is not None
+    assert [f.name for f in restored.step_fn_defs] == ["classify", "summarize"]
+    assert restored.step_output_fields == [{"label": "string"}, {"summary": "string"}]
+    assert len(restored.step_ensures) == len(restored.ordered_steps)
+
+
 def test_delete_persisted_flow_removes_file(patch_flows_dir):
     spec = parse_and_validate(SIMPLE_IR)
     state = create_flow_state(spec, "run", {"text": "bye"}, raw_spec=SIMPLE_IR)
@@ -81,6 +81,27 @@ async def test_roundtrip_audit_after_completion():
     assert "rounds" in audit, "rounds must always be present in stratum_audit output"
 
 
+@pytest.mark.asyncio
+async def test_roundtrip_repeat_plans_share_unmodified_spec():
+    """Identical spec text is parsed once; running a flow must not mutate the shared IRSpec."""
+    import copy
+    from stratum_mcp.executor import _flows
+    ctx = MagicMock()
+    plan = await stratum_plan(VALID_IR, "run", {"text": "first"}, ctx)
+    spec = _flows[plan["flow_id"]].spec
+    pristine = copy.deepcopy(spec)
+
+    plan["inputs"]["text"] = "tampered"
+    await stratum_step_done(
+        plan["flow_id"], "s1", {"label": "positive", "confidence": 0.9, "reasoning": "r"}, ctx
+    )
+
+    again = await stratum_plan(VALID_IR, "run", {"text": "second"}, ctx)
+    assert _flows[again["flow_id"]].spec is spec
+    assert spec == pristine
+    assert again["inputs"] == {"text": "second"}
+
+
 @pytest.mark.asyncio
 async def test_roundtrip_two_step_chained_refs():
     """Two-step flow: s2 reads a field from s1's output via $.steps.s1.output.label."""
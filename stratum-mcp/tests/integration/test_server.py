@@ -70,9 +70,22 @@ async def test_four_tools_registered():
     assert "stratum_validate" in tool_names
     assert "stratum_plan" in tool_names
     assert "stratum_step_done" in tool_names
+    assert "stratum_step_done_batch" in tool_names
     assert "stratum_audit" in tool_names
 
 
+def test_server_import_defers_mcp_sdk():
+    # CLI subcommands import stratum_mcp.server; only the stdio server needs the SDK.
+    import subprocess
+    import sys
+    code = (
+        "import sys, stratum_mcp.server as s; "
+        "assert 'mcp.server.fastmcp' not in sys.modules; "
+        "s.mcp; assert 'mcp.server.fastmcp' in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
 @pytest.mark.asyncio
 async def test_validate_accepts_valid_ir():
     from stratum_mcp.server import stratum_validate
@@ -201,6 +214,62 @@ async def test_step_done_unknown_flow_id():
     assert result["error_type"] == "flow_not_found"
 
 
+@pytest.mark.asyncio
+async def test_step_done_batch_completes_flow_in_one_call():
+    from stratum_mcp.server import stratum_plan, stratum_step_done_batch
+    ctx = MagicMock()
+    plan = await stratum_plan(TWO_STEP_IR, "pipeline", {"text": "great!"}, ctx)
+
+    done = await stratum_step_done_batch(plan["flow_id"], [
+        {"step_id": "s1", "result": {"label": "positive"}},
+        {"step_id": "s2", "result": {"summary": "The text is positive."}},
+    ], ctx)
+    assert done["status"] == "complete"
+    assert done["output"] == {"summary": "The text is positive."}
+    assert [r["step_id"] for r in done["trace"]] == ["s1", "s2"]
+    assert done["processed"] == ["s1", "s2"]
+    assert done["remaining"] == []
+
+
+@pytest.mark.asyncio
+async def test_step_done_batch_stops_at_first_failure():
+    from stratum_mcp.server import stratum_plan, stratum_step_done_batch
+    ctx = MagicMock()
+    plan = await stratum_plan(VALID_IR, "run", {"text": "hello"}, ctx)
+
+    result = await stratum_step_done_batch(plan["flow_id"], [
+        {"step_id": "s1", "result": {"label": "", "confidence": 0.0}},
+        {"step_id": "s1", "result": {"label": "positive", "confidence": 0.9}},
+    ], ctx)
+    assert result["status"] == "ensure_failed"
+    assert result["retries_remaining"] == 1
+    assert result["processed"] == ["s1"]
+    assert result["remaining"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_step_done_batch_rejects_malformed_entry():
+    from stratum_mcp.server import stratum_audit, stratum_plan, stratum_step_done_batch
+    ctx = MagicMock()
+    plan = await stratum_plan(TWO_STEP_IR, "pipeline", {"text": "great!"}, ctx)
+
+    # The bad entry is at index 1: entry 0 must not be applied either.
+    result = await stratum_step_done_batch(plan["flow_id"], [
+        {"step_id": "s1", "result": {"label": "positive"}},
+        {"result": {"summary": "missing step_id"}},
+    ], ctx)
+    assert result["status"] == "error"
+    assert result["error_type"] == "invalid_batch_item"
+    assert "results[1]" in result["message"]
+    assert result["processed"] == []
+    assert result["remaining"] == [0, 1]
+    audit = await stratum_audit(plan["flow_id"], ctx)
+    assert audit["trace"] == []
+
+    empty = await stratum_step_done_batch(plan["flow_id"], [], ctx)
+    assert empty["error_type"] == "empty_batch"
+
+
 @pytest.mark.asyncio
 async def test_audit_returns_trace():
     from stratum_mcp.server import stratum_plan, stratum_step_done, stratum_audit
@@ -218,6 +287,53 @@ async def test_audit_returns_trace():
     assert "rounds" in audit, "rounds must always be present in stratum_audit output"
 
 
+@pytest.mark.asyncio
+async def test_audit_since_returns_only_newer_trace_entries():
+    from stratum_mcp.server import stratum_plan, stratum_step_done, stratum_audit
+    ctx = MagicMock()
+    plan = await stratum_plan(TWO_STEP_IR, "pipeline", {"text": "great!"}, ctx)
+    flow_id = plan["flow_id"]
+    await stratum_step_done(flow_id, "s1", {"label": "positive"}, ctx)
+    first = await stratum_audit(flow_id, ctx)
+    assert [r["step_id"] for r in first["trace"]] == ["s1"]
+    assert "trace_since" not in first
+
+    await stratum_step_done(flow_id, "s2", {"summary": "ok"}, ctx)
+    delta = await stratum_audit(flow_id, ctx, since=len(first["trace"]))
+    assert [r["step_id"] for r in delta["trace"]] == ["s2"]
+    assert delta["trace_since"] == 1
+    assert delta["steps_completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_audit_since_converts_only_newer_records(monkeypatch):
+    import stratum_mcp.server as server_mod
+    from stratum_mcp.server import stratum_plan, stratum_step_done, stratum_audit
+    ctx = MagicMock()
+    plan = await stratum_plan(TWO_STEP_IR, "pipeline", {"text": "great!"}, ctx)
+    flow_id = plan["flow_id"]
+    await stratum_step_done(flow_id, "s1", {"label": "positive"}, ctx)
+    await stratum_step_done(flow_id, "s2", {"summary": "ok"}, ctx)
+
+    converted = []
+    real = server_mod._record_to_dict
+    monkeypatch.setattr(server_mod, "_record_to_dict", lambda r: converted.append(r.step_id) or real(r))
+    monkeypatch.setattr(server_mod, "_records_as_dicts", lambda s: pytest.fail("full trace built"))
+    delta = await stratum_audit(flow_id, ctx, since=1)
+    assert converted == ["s2"]
+    assert [r["step_id"] for r in delta["trace"]] == ["s2"]
+
+
+@pytest.mark.asyncio
+async def test_audit_rejects_negative_since():
+    from stratum_mcp.server import stratum_plan, stratum_audit
+    ctx = MagicMock()
+    plan = await stratum_plan(TWO_STEP_IR, "pipeline", {"text": "great!"}, ctx)
+    result = await stratum_audit(plan["flow_id"], ctx, since=-1)
+    assert result["status"] == "error"
+    assert result["error_type"] == "invalid_since"
+
+
 @pytest.mark.asyncio
 async def test_audit_unknown_flow_id():
     from stratum_mcp.server import stratum_audit
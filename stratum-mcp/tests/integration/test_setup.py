@@ -3,18 +3,21 @@ import json
 import pytest
 from pathlib import Path
 
-from stratum_mcp.server import _cmd_setup, _CLAUDE_MD_MARKER, _CLAUDE_MD_BLOCK, _HOOK_SCRIPTS, _STRATUM_HOOKS_DIR
+from stratum_mcp.server import _cmd_setup, _project_root, _CLAUDE_MD_MARKER, _CLAUDE_MD_BLOCK, _HOOK_SCRIPTS, _STRATUM_HOOKS_DIR
 
 
 def _run_setup(tmp_path: Path) -> None:
-    """Run _cmd_setup with cwd set to tmp_path."""
-    import os
-    old = os.getcwd()
-    try:
-        os.chdir(tmp_path)
-        _cmd_setup()
-    finally:
-        os.chdir(old)
+    """Run _cmd_setup against tmp_path as the project root."""
+    _cmd_setup(root=tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def skills_home(tmp_path, monkeypatch):
+    """Redirect _SKILLS_HOME to a temp dir so tests never touch ~/.claude/skills."""
+    home = tmp_path / ".skills-home-test"
+    import stratum_mcp.server as srv
+    monkeypatch.setattr(srv, "_SKILLS_HOME", home)
+    return home
 
 
 # ---------------------------------------------------------------------------
@@ -138,13 +141,7 @@ def test_setup_finds_root_via_git(tmp_path, capsys):
     subdir = tmp_path / "src" / "mymodule"
     subdir.mkdir(parents=True)
 
-    import os
-    old = os.getcwd()
-    try:
-        os.chdir(subdir)
-        _cmd_setup()
-    finally:
-        os.chdir(old)
+    _cmd_setup(root=_project_root(subdir))
 
     # Files written at repo root, not subdir
     assert (tmp_path / ".claude" / "mcp.json").exists()
@@ -156,13 +153,7 @@ def test_setup_finds_root_via_claude_md(tmp_path):
     subdir = tmp_path / "nested"
     subdir.mkdir()
 
-    import os
-    old = os.getcwd()
-    try:
-        os.chdir(subdir)
-        _cmd_setup()
-    finally:
-        os.chdir(old)
+    _cmd_setup(root=_project_root(subdir))
 
     assert (tmp_path / ".claude" / "mcp.json").exists()
 
@@ -178,47 +169,64 @@ def test_setup_done_message_on_changes(tmp_path, capsys):
 # ---------------------------------------------------------------------------
 
 EXPECTED_SKILLS = ["stratum-review", "stratum-feature", "stratum-debug", "stratum-refactor"]
-SKILLS_HOME = Path.home() / ".claude" / "skills"
 
 
-def test_setup_installs_all_skills(tmp_path, capsys):
+def test_setup_installs_all_skills(tmp_path, capsys, skills_home):
     _run_setup(tmp_path)
     for skill in EXPECTED_SKILLS:
-        assert (SKILLS_HOME / skill / "SKILL.md").exists(), f"Missing skill: {skill}"
+        assert (skills_home / skill / "SKILL.md").exists(), f"Missing skill: {skill}"
 
 
-def test_setup_skill_contains_frontmatter(tmp_path):
+def test_setup_skill_contains_frontmatter(tmp_path, skills_home):
     _run_setup(tmp_path)
     for skill in EXPECTED_SKILLS:
-        content = (SKILLS_HOME / skill / "SKILL.md").read_text()
+        content = (skills_home / skill / "SKILL.md").read_text()
         assert content.startswith("---"), f"{skill} missing frontmatter"
         assert f"name: {skill}" in content
 
 
-def test_setup_skill_contains_key_instructions(tmp_path):
+def test_setup_skill_contains_key_instructions(tmp_path, skills_home):
     _run_setup(tmp_path)
     for skill in EXPECTED_SKILLS:
-        content = (SKILLS_HOME / skill / "SKILL.md").read_text()
+        content = (skills_home / skill / "SKILL.md").read_text()
         assert "stratum_plan" in content, f"{skill} missing stratum_plan reference"
         assert "stratum_step_done" in content, f"{skill} missing stratum_step_done reference"
         assert "never show it to the user" in content, f"{skill} missing privacy instruction"
 
 
-def test_setup_skill_idempotent(tmp_path, capsys):
+def test_setup_skill_idempotent(tmp_path, capsys, skills_home):
     _run_setup(tmp_path)
     _run_setup(tmp_path)
     out = capsys.readouterr().out
     assert "nothing to do" in out
     for skill in EXPECTED_SKILLS:
-        content = (SKILLS_HOME / skill / "SKILL.md").read_text()
+        content = (skills_home / skill / "SKILL.md").read_text()
         assert content.count(f"name: {skill}") == 1
 
 
+def test_package_skills_lists_bundled_skill_dirs():
+    from stratum_mcp.server import _package_skills
+    names = [d.name for d in _package_skills()]
+    assert names == sorted(names)
+    assert set(EXPECTED_SKILLS) <= set(names)
+
+
+def test_file_equals_compares_size_then_bytes(tmp_path):
+    from stratum_mcp.server import _file_equals
+    f = tmp_path / "SKILL.md"
+    assert not _file_equals(f, b"abc")  # missing
+    f.write_bytes(b"abc")
+    assert _file_equals(f, b"abc")
+    assert not _file_equals(f, b"abcd")  # size differs
+    assert not _file_equals(f, b"abd")   # same size, different bytes
+    assert not _file_equals(tmp_path, b"")  # directory
+
+
 # ---------------------------------------------------------------------------
 # Hooks (T2-M2/M3/M4)
 # ---------------------------------------------------------------------------
 
-@pytest.fixture(autouse=False)
+@pytest.fixture(autouse=True)
 def isolated_hooks_dir(tmp_path, monkeypatch):
     """Redirect _STRATUM_HOOKS_DIR to a temp dir so hook tests are isolated."""
     hooks_dir = tmp_path / ".stratum-hooks-test"
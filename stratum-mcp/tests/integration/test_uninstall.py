@@ -1,22 +1,22 @@
 """Tests for `stratum-mcp uninstall` CLI command."""
 import json
-import os
 import pytest
 from pathlib import Path
 
 from stratum_mcp.server import _cmd_setup, _cmd_uninstall, _CLAUDE_MD_MARKER
 
 
-SKILLS_HOME = Path.home() / ".claude" / "skills"
+@pytest.fixture(autouse=True)
+def skills_home(tmp_path, monkeypatch):
+    """Redirect _SKILLS_HOME to a temp dir so tests never touch ~/.claude/skills."""
+    home = tmp_path / ".skills-home-test"
+    import stratum_mcp.server as srv
+    monkeypatch.setattr(srv, "_SKILLS_HOME", home)
+    return home
 
 
 def _run(tmp_path: Path, fn, **kwargs) -> None:
-    old = os.getcwd()
-    try:
-        os.chdir(tmp_path)
-        fn(**kwargs)
-    finally:
-        os.chdir(old)
+    fn(root=tmp_path, **kwargs)
 
 
 def _setup(tmp_path):
@@ -119,7 +119,7 @@ def test_uninstall_skips_claude_md_when_absent(tmp_path, capsys):
 # Skills
 # ---------------------------------------------------------------------------
 
-def test_uninstall_removes_skills(tmp_path, capsys):
+def test_uninstall_removes_skills(tmp_path, capsys, skills_home):
     _setup(tmp_path)
     capsys.readouterr()
 
@@ -132,11 +132,11 @@ def test_uninstall_removes_skills(tmp_path, capsys):
     for skill_dir in pkg_skills.iterdir():
         if not skill_dir.is_dir():
             continue
-        assert not (SKILLS_HOME / skill_dir.name / "SKILL.md").exists(), \
+        assert not (skills_home / skill_dir.name / "SKILL.md").exists(), \
             f"Skill {skill_dir.name} was not removed"
 
 
-def test_uninstall_keep_skills_flag(tmp_path, capsys):
+def test_uninstall_keep_skills_flag(tmp_path, capsys, skills_home):
     _setup(tmp_path)
     capsys.readouterr()
 
@@ -148,7 +148,7 @@ def test_uninstall_keep_skills_flag(tmp_path, capsys):
     for skill_dir in pkg_skills.iterdir():
         if not skill_dir.is_dir():
             continue
-        assert (SKILLS_HOME / skill_dir.name / "SKILL.md").exists(), \
+        assert (skills_home / skill_dir.name / "SKILL.md").exists(), \
             f"Skill {skill_dir.name} was removed despite --keep-skills"
     assert "--keep-skills" in capsys.readouterr().out
 
@@ -194,7 +194,7 @@ def test_uninstall_prints_nothing_to_remove_when_already_clean(tmp_path, capsys)
 from stratum_mcp.server import _HOOK_SCRIPTS, _STRATUM_HOOKS_DIR
 
 
-@pytest.fixture(autouse=False)
+@pytest.fixture(autouse=True)
 def isolated_hooks_dir(tmp_path, monkeypatch):
     """Redirect _STRATUM_HOOKS_DIR to a temp dir so hook tests are isolated."""
     hooks_dir = tmp_path / ".stratum-hooks-test"
@@ -1,17 +1,40 @@
 """Tests for DAG executor invariants: ensure eval, ref resolution, topo sort."""
+import dataclasses
+import os
+from types import SimpleNamespace
+
 import pytest
 
+import stratum_mcp.executor as executor_mod
 from stratum_mcp.executor import (
     _ENSURE_BUILTINS,
+    _ENSURE_GLOBALS,
     _FILE_CONTAINS_SIZE_LIMIT,
+    _MAX_SCHEMA_ERRORS,
+    _SKIP_IF_GLOBALS,
+    _compile_skip_if,
+    _FlowStore,
+    _parse_ref,
+    _record_to_dict,
+    _topological_sort,
     _validate_output_schema,
+    _validator_for,
     EnsureCompileError,
+    FlowState,
+    GateRecord,
+    PolicyRecord,
     RefResolutionError,
+    SkipRecord,
+    StepRecord,
     compile_ensure,
+    create_flow_state,
+    evaluate_skip_if,
+    get_current_step_info,
+    process_step_result,
     resolve_ref,
 )
 from stratum_mcp.errors import MCPExecutionError
-from stratum_mcp.spec import IRFlowDef, IRStepDef, IRFunctionDef, IRBudgetDef
+from stratum_mcp.spec import IRFlowDef, IRStepDef, IRFunctionDef, IRBudgetDef, parse_and_validate
 
 
 # ---------------------------------------------------------------------------
@@ -50,6 +73,33 @@ def test_compile_ensure_on_non_dict():
     assert fn(3) is False
 
 
+@pytest.mark.parametrize("expr,result,expected", [
+    ("result.n > 2", {"n": 3}, True),
+    ("result.n <= 2", {"n": 3}, False),
+    ("result.label != 'x'", {"label": "y"}, True),
+    ("result.value is None", {"value": None}, True),
+    ("len(result.items) >= 2", {"items": [1, 2]}, True),
+    ("result.ok", {"ok": 0}, False),
+    ("result.n > 2", type("R", (), {"n": 5})(), True),
+])
+def test_compile_ensure_fast_path_matches_eval(expr, result, expected):
+    assert compile_ensure(expr)(result) is expected
+
+
+def test_compile_ensure_fast_path_errors_match_eval_path():
+    """A missing field on the fast path reports the same error as eval would."""
+    with pytest.raises(EnsureCompileError, match="has no attribute 'missing'"):
+        compile_ensure("result.missing > 1")({"other": 1})
+    with pytest.raises(EnsureCompileError, match="not supported between"):
+        compile_ensure("result.n > 1")({"n": "a"})
+
+
+def test_compile_ensure_is_memoized_per_expression():
+    """Retries reuse the same compiled evaluator instead of recompiling."""
+    assert compile_ensure("result.n >= 1") is compile_ensure("result.n >= 1")
+    assert compile_ensure("result.n >= 1") is not compile_ensure("result.n >= 2")
+
+
 # ---------------------------------------------------------------------------
 # file-aware builtins
 # ---------------------------------------------------------------------------
@@ -102,6 +152,43 @@ def test_file_contains_oversized_file_returns_false(tmp_path, monkeypatch):
     assert fn({"path": str(f)}) is False
 
 
+def test_file_contains_rereads_same_size_rewrite_within_mtime_tick(tmp_path):
+    """No stat-keyed memo: a same-size rewrite with an unchanged mtime is seen."""
+    f = tmp_path / "out.md"
+    f.write_text("draft")
+    st = f.stat()
+    fn = compile_ensure("file_contains(result.path, 'final')")
+    assert fn({"path": str(f)}) is False
+    f.write_text("final")
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns))  # coarse-timestamp filesystem
+    assert fn({"path": str(f)}) is True
+
+
+def test_file_contains_ascii_marker_amid_invalid_utf8(tmp_path):
+    f = tmp_path / "mixed.bin"
+    f.write_bytes(b"\xe2\x28marker\xff")
+    fn = compile_ensure("file_contains(result.path, 'marker')")
+    assert fn({"path": str(f)}) is True
+
+
+def test_file_contains_non_ascii_substring(tmp_path):
+    f = tmp_path / "utf8.md"
+    f.write_text("résumé", encoding="utf-8")
+    assert compile_ensure("file_contains(result.path, 'sumé')")({"path": str(f)}) is True
+    assert compile_ensure("file_contains(result.path, 'sume')")({"path": str(f)}) is False
+
+
+def test_file_contains_empty_file(tmp_path):
+    f = tmp_path / "empty.md"
+    f.write_text("")
+    assert compile_ensure("file_contains(result.path, 'x')")({"path": str(f)}) is False
+
+
+def test_file_contains_directory_returns_false(tmp_path):
+    fn = compile_ensure("file_contains(result.path, 'x')")
+    assert fn({"path": str(tmp_path)}) is False
+
+
 # ---------------------------------------------------------------------------
 # _validate_output_schema
 # ---------------------------------------------------------------------------
@@ -136,6 +223,11 @@ def test_validate_output_schema_multiple_violations():
     assert len(errors) == 2
 
 
+def test_validate_output_schema_caps_reported_violations():
+    schema = {"type": "object", "required": [f"f{i}" for i in range(_MAX_SCHEMA_ERRORS + 5)]}
+    assert len(_validate_output_schema({}, schema)) == _MAX_SCHEMA_ERRORS
+
+
 def test_validate_output_schema_unresolvable_ref_returns_violation():
     """Unresolvable $ref in output_schema returns a violation string, not an exception."""
     schema = {"$ref": "#/$defs/DoesNotExist"}
@@ -151,6 +243,12 @@ def test_validate_output_schema_empty_schema_accepts_anything():
     assert _validate_output_schema({"nested": {"deep": True}}, {}) == []
 
 
+def test_validator_reused_per_schema_object():
+    schema = {"type": "object"}
+    assert _validator_for(schema) is _validator_for(schema)
+    assert _validator_for(schema) is not _validator_for({"type": "object"})
+
+
 def test_ensure_builtins_no_dangerous_names():
     """_ENSURE_BUILTINS must not expose exec, eval, import, or open at top level."""
     dangerous = {"exec", "eval", "__import__", "compile", "globals", "locals", "vars"}
@@ -176,6 +274,15 @@ def test_resolve_ref_step_output_field():
     assert result == "positive"
 
 
+def test_resolve_ref_path_walk_mixes_keys_attributes_and_none():
+    """Each path segment is a dict key or attribute, and None short-circuits mid-path."""
+    outputs = {"s1": {"a": SimpleNamespace(b={"c": 3}), "n": None}}
+    assert resolve_ref("$.steps.s1.output.a.b.c", {}, outputs) == 3
+    assert resolve_ref("$.steps.s1.output.n.deeper", {}, outputs) is None
+    with pytest.raises(RefResolutionError, match="Attribute 'x' not found"):
+        resolve_ref("$.steps.s1.output.a.x", {}, outputs)
+
+
 def test_resolve_ref_literal():
     assert resolve_ref("some literal", {}, {}) == "some literal"
 
@@ -190,6 +297,20 @@ def test_resolve_ref_step_not_executed_raises():
         resolve_ref("$.steps.s99.output", {}, {})
 
 
+def test_parse_ref_splits_once_into_tagged_tuple():
+    assert _parse_ref("$.input.text") == ("input", "text", None)
+    assert _parse_ref("$.steps.s1.output.a.b") == ("steps", "s1", ("a", "b"))
+    assert _parse_ref("$.steps.s1.output") == ("steps", "s1", ())
+    assert _parse_ref("$.steps.s1.output") is _parse_ref("$.steps.s1.output")
+
+
+def test_resolve_ref_missing_step_reported_before_bad_path():
+    with pytest.raises(RefResolutionError, match="not yet executed"):
+        resolve_ref("$.steps.s1.result", {}, {})
+    with pytest.raises(RefResolutionError, match="Expected"):
+        resolve_ref("$.steps.s1.result", {}, {"s1": {}})
+
+
 # ---------------------------------------------------------------------------
 # _topological_sort
 # ---------------------------------------------------------------------------
@@ -214,7 +335,6 @@ def _make_flow(steps: list[IRStepDef]) -> IRFlowDef:
 
 
 def test_topological_sort_linear():
-    from stratum_mcp.executor import _topological_sort
     steps = [
         _make_step("s1"),
         _make_step("s2", depends_on=["s1"]),
@@ -227,7 +347,6 @@ def test_topological_sort_linear():
 
 
 def test_topological_sort_parallel_independent():
-    from stratum_mcp.executor import _topological_sort
     steps = [
         _make_step("s1"),
         _make_step("s2"),
@@ -241,7 +360,6 @@ def test_topological_sort_parallel_independent():
 
 
 def test_topological_sort_implicit_ref_dependency():
-    from stratum_mcp.executor import _topological_sort
     # s2 references s1's output via $ ref — should be ordered after s1
     steps = [
         _make_step("s1"),
@@ -254,7 +372,6 @@ def test_topological_sort_implicit_ref_dependency():
 
 
 def test_topological_sort_cycle_raises():
-    from stratum_mcp.executor import _topological_sort
     steps = [
         _make_step("s1", depends_on=["s2"]),
         _make_step("s2", depends_on=["s1"]),
@@ -262,3 +379,243 @@ def test_topological_sort_cycle_raises():
     flow = _make_flow(steps)
     with pytest.raises(MCPExecutionError, match="Cycle detected"):
         _topological_sort(flow)
+
+
+def test_topological_sort_ties_keep_declaration_order():
+    steps = [
+        _make_step("root"),
+        _make_step("b", depends_on=["root"]),
+        _make_step("a", depends_on=["root"]),
+        _make_step("join", inputs={"x": "$.steps.a.output", "y": "$.steps.b.output"}),
+    ]
+    ordered = _topological_sort(_make_flow(steps))
+    assert [s.id for s in ordered] == ["root", "b", "a", "join"]
+
+
+def test_topological_sort_cycle_reports_only_unsorted_steps():
+    steps = [
+        _make_step("ok"),
+        _make_step("s1", depends_on=["s2"]),
+        _make_step("s2", depends_on=["s1"]),
+    ]
+    with pytest.raises(MCPExecutionError, match=r"\['s1', 's2'\]"):
+        _topological_sort(_make_flow(steps))
+
+
+def test_sorted_steps_sorts_each_flow_once(monkeypatch):
+    calls = []
+    real_sort = executor_mod._topological_sort
+    monkeypatch.setattr(executor_mod, "_topological_sort", lambda f: calls.append(f) or real_sort(f))
+    flow = _make_flow([_make_step("s1"), _make_step("s2", depends_on=["s1"])])
+    first = executor_mod._sorted_steps(flow)
+    second = executor_mod._sorted_steps(flow)
+    assert [s.id for s in first] == [s.id for s in second] == ["s1", "s2"]
+    assert first is not second
+    assert calls == [flow]
+
+
+def test_shared_eval_globals_not_mutated_by_expressions():
+    before = (set(_ENSURE_GLOBALS), set(_SKIP_IF_GLOBALS))
+    assert compile_ensure("(leak := 1) == 1 and result is None")(None) is True
+    assert evaluate_skip_if("(leak := 1) == 1", {}, {}) is True
+    assert (set(_ENSURE_GLOBALS), set(_SKIP_IF_GLOBALS)) == before
+
+
+def test_skip_if_compiles_once_and_works_on_copies():
+    inputs = {"allowed": ["x", "y"]}
+    outputs = {"a": {"n": 3, "tags": ["x", "y"]}}
+    expr = "len([t for t in $.steps.a.output.tags if t in $.input.allowed]) == 2"
+    _compile_skip_if.cache_clear()
+    assert evaluate_skip_if(expr, inputs, outputs) is True
+    outputs["a"]["tags"].append("z")
+    assert evaluate_skip_if(expr, inputs, outputs) is True
+    assert _compile_skip_if.cache_info().misses == 1
+    assert evaluate_skip_if("($.steps.a.output.tags).clear() is None", inputs, outputs) is True
+    assert outputs["a"]["tags"] == ["x", "y", "z"]
+    assert evaluate_skip_if("$.steps.gone.output.v is None", inputs, outputs) is True
+    # Not a single expression on its own, even though it parses once wrapped.
+    assert evaluate_skip_if("1) or (1", inputs, outputs) is False
+
+
+def _stub_flow(finished: bool = False):
+    return SimpleNamespace(
+        last_access=0.0, terminal_status=None, ordered_steps=["s1"], current_idx=1 if finished else 0,
+    )
+
+
+def test_flow_store_evicts_least_recently_used():
+    store = _FlowStore(maxsize=2, ttl=3600)
+    a, b, c = (_stub_flow() for _ in range(3))
+    store["a"] = a
+    store["b"] = b
+    assert store.get("a") is a      # touch a; b is now oldest
+    store["c"] = c
+    assert list(store) == ["a", "c"]
+    assert store.get("b") is None
+
+
+def test_flow_store_expires_idle_flows(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(executor_mod.time, "monotonic", lambda: now[0])
+    store = executor_mod._FlowStore(maxsize=10, ttl=60)
+    store["old"] = _stub_flow()
+    now[0] += 30
+    store["new"] = _stub_flow()
+    now[0] += 45                    # old idle 75 s, new idle 45 s
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+
+def test_flow_store_keeps_idle_finished_flows(monkeypatch):
+    # A finished flow's disk file is gone; idle expiry must not take the only
+    # copy stratum_audit can read. The LRU cap still bounds them.
+    now = [1000.0]
+    monkeypatch.setattr(executor_mod.time, "monotonic", lambda: now[0])
+    store = executor_mod._FlowStore(maxsize=10, ttl=60)
+    store["done"] = _stub_flow(finished=True)
+    store["killed"] = killed = _stub_flow()
+    killed.terminal_status = "killed"
+    store["running"] = _stub_flow()
+    now[0] += 120
+    assert store.get("running") is None
+    assert store.get("done") is not None
+    assert store.get("killed") is killed
+
+
+def test_record_to_dict_matches_asdict():
+    records = [
+        StepRecord(step_id="s1", function_name="f", attempts=1, duration_ms=3, agent="a"),
+        GateRecord(step_id="g", outcome="approve", rationale="ok", resolved_by="human", duration_ms=1),
+        SkipRecord(step_id="s2", skip_reason="why"),
+        PolicyRecord(step_id="g2", effective_policy="flag", resolved_outcome="approve", rationale="r"),
+    ]
+    for r in records:
+        assert _record_to_dict(r) == dataclasses.asdict(r)
+
+
+def test_records_and_flow_state_use_slots():
+    rec = StepRecord(step_id="s1", function_name="f", attempts=1, duration_ms=0)
+    assert not hasattr(rec, "__dict__")
+    assert "__dict__" not in FlowState.__dict__ and "__slots__" in FlowState.__dict__
+
+
+_DISPATCH_SPEC = """
+version: "0.1"
+contracts:
+  Out:
+    value: {type: string}
+functions:
+  extract:
+    mode: infer
+    intent: "Extract a value"
+    input: {text: {type: string}}
+    output: Out
+    ensure: ["result.value != ''"]
+    retries: 3
+flows:
+  run:
+    input: {text: {type: string}}
+    output: Out
+    steps:
+      - id: s1
+        function: extract
+        inputs: {text: "$.input.text"}
+"""
+
+
+def _dispatch_state(spec=_DISPATCH_SPEC):
+    return create_flow_state(parse_and_validate(spec), "run", {"text": "t"})
+
+
+def test_dispatch_payload_built_from_template_per_attempt():
+    state = _dispatch_state()
+    first = get_current_step_info(state)
+    assert list(first) == [
+        "status", "flow_id", "step_number", "total_steps", "step_id", "step_mode",
+        "function", "agent", "mode", "intent", "inputs", "output_contract",
+        "output_fields", "ensure", "retries_remaining",
+    ]
+    assert first["inputs"] == {"text": "t"}
+    assert first["output_fields"] == {"value": "string"}
+    assert first["retries_remaining"] == 3
+
+    assert process_step_result(state, "s1", {"value": ""})[0] == "ensure_failed"
+    second = get_current_step_info(state)
+    assert second["retries_remaining"] == 2
+    assert first["retries_remaining"] == 3
+    assert state.step_dispatch[0]["inputs"] is None
+
+    # Containers are per payload: mutating one leaks into neither the next
+    # dispatch nor the flow's precomputed output fields.
+    second["output_fields"]["injected"] = "x"
+    second["ensure"].append("result.x")
+    third = get_current_step_info(state)
+    assert third["output_fields"] == {"value": "string"}
+    assert third["ensure"] == ["result.value != ''"]
+    assert state.step_output_fields[0] == {"value": "string"}
+
+
+def test_step_info_not_memoized_per_index_and_attempt(monkeypatch):
+    # Same (current_idx, attempts) can legitimately need a different payload:
+    # upstream outputs change under revert/gate-revise, and every dispatch must
+    # restart the step's duration clock.
+    state = _dispatch_state(_DISPATCH_SPEC.replace(
+        '        inputs: {text: "$.input.text"}\n',
+        '        inputs: {text: "$.input.text"}\n'
+        '      - id: s2\n        function: extract\n'
+        '        inputs: {text: "$.steps.s1.output.value"}\n        depends_on: [s1]\n',
+    ))
+    executor_mod.get_current_step_info(state)
+    assert executor_mod.process_step_result(state, "s1", {"value": "a"}) == ("ok", [])
+
+    clock = iter([10, 20])
+    monkeypatch.setattr(executor_mod.time, "perf_counter_ns", lambda: next(clock))
+    first = executor_mod.get_current_step_info(state)
+    assert first["inputs"] == {"text": "a"} and state.dispatched_ns[1] == 10
+    state.step_outputs["s1"] = {"value": "b"}
+    second = executor_mod.get_current_step_info(state)
+    assert second["inputs"] == {"text": "b"} and state.dispatched_ns[1] == 20
+    assert first["inputs"] == {"text": "a"}
+
+
+def test_literal_only_inputs_are_copied_not_resolved(monkeypatch):
+    state = _dispatch_state(_DISPATCH_SPEC.replace('"$.input.text"', '"fixed"'))
+    assert state.step_has_refs == [False]
+    monkeypatch.setattr(executor_mod, "resolve_inputs", lambda *a: pytest.fail("resolved"))
+    info = executor_mod.get_current_step_info(state)
+    assert info["inputs"] == {"text": "fixed"}
+    assert info["inputs"] is not state.ordered_steps[0].inputs
+
+
+def test_step_duration_measured_from_dispatch(monkeypatch):
+    state = _dispatch_state()
+    assert state.dispatched_ns == [0]
+    clock = iter([1_000_000_000, 1_250_000_000])
+    monkeypatch.setattr(executor_mod.time, "perf_counter_ns", lambda: next(clock))
+    executor_mod.get_current_step_info(state)
+    assert executor_mod.process_step_result(state, "s1", {"value": "x"}) == ("ok", [])
+    assert state.records[-1].duration_ms == 250
+
+
+def test_records_as_dicts_converts_only_new_records():
+    state = _dispatch_state()
+    state.records.append(executor_mod.SkipRecord(step_id="a", skip_reason="x"))
+    first = executor_mod._cached_record_dicts(state)
+    state.records.append(executor_mod.SkipRecord(step_id="b", skip_reason="y"))
+    second = executor_mod._cached_record_dicts(state)
+    assert second[0] is first[0]
+    assert [d["step_id"] for d in second] == ["a", "b"]
+
+    state.records.pop(0)  # removal or replacement invalidates from that point
+    assert [d["step_id"] for d in executor_mod._cached_record_dicts(state)] == ["b"]
+
+
+def test_records_as_dicts_returns_unshared_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor_mod, "_FLOWS_DIR", tmp_path / "flows")
+    state = _dispatch_state()
+    state.records.append(executor_mod.SkipRecord(step_id="a", skip_reason="x"))
+    executor_mod.commit_checkpoint(state, "cp")
+    trace = executor_mod._records_as_dicts(state)
+    trace[0]["step_id"] = "mutated"
+    assert state.checkpoints["cp"]["records"][0]["step_id"] == "a"
+    assert executor_mod._records_as_dicts(state)[0]["step_id"] == "a"
@@ -105,6 +105,57 @@ class TestParallelN:
         with pytest.raises(Exception):
             await parallel(ok(), bad(), require=2)
 
+    @pytest.mark.asyncio
+    async def test_cancels_rest_once_n_succeed(self):
+        cancelled = asyncio.Event()
+        async def fast(): return "fast"
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        result = await asyncio.wait_for(parallel(slow(), fast(), fast(), require=2), 1)
+        assert result == ["fast", "fast"]
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_raises_as_soon_as_n_unreachable(self):
+        async def bad(): raise RuntimeError("fail")
+        async def slow():
+            await asyncio.sleep(10)
+            return "slow"
+        with pytest.raises(RuntimeError, match="fail"):
+            await asyncio.wait_for(parallel(bad(), slow(), require=2), 1)
+
+    @pytest.mark.asyncio
+    async def test_outer_cancellation_cancels_children(self):
+        started = [0]
+        cancelled = [0]
+        async def slow():
+            started[0] += 1
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled[0] += 1
+                raise
+        outer = asyncio.create_task(parallel(slow(), slow(), require=2))
+        while started[0] < 2:
+            await asyncio.sleep(0)
+        outer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await outer
+        assert cancelled[0] == 2
+
+    @pytest.mark.asyncio
+    async def test_child_cancelled_elsewhere_counts_as_missing(self):
+        async def ok(): return "ok"
+        async def victim():
+            asyncio.current_task().cancel()
+            await asyncio.sleep(0)
+        with pytest.raises(RuntimeError, match="needed 2 successes"):
+            await asyncio.wait_for(parallel(ok(), victim(), require=2), 1)
+
 
 class TestParallelZero:
     @pytest.mark.asyncio
@@ -310,3 +361,29 @@ class TestQuorum:
 
         # Should pick the highest-confidence agreeing result
         assert result.confidence == 0.95
+
+    @pytest.mark.asyncio
+    async def test_quorum_calls_are_in_flight_concurrently(self):
+        """All quorum samples must be dispatched before any completes."""
+        clear_traces()
+
+        @infer(intent="Vote", quorum=3, agree_on="label", threshold=2)
+        def vote(question: str) -> Vote: ...
+
+        in_flight = [0]
+        all_started = asyncio.Event()
+
+        async def barrier(**kwargs):
+            in_flight[0] += 1
+            if in_flight[0] == 3:
+                all_started.set()
+            # Sequential dispatch would never reach 3 and time out here
+            await asyncio.wait_for(all_started.wait(), timeout=1.0)
+            return _make_response({"label": "yes", "confidence": 0.9})
+
+        with patch("litellm.acompletion", new=barrier):
+            with patch("litellm.completion_cost", return_value=0.0):
+                result = await vote(question="Parallel?")
+
+        assert result.label == "yes"
+        assert in_flight[0] == 3
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import json
 import sys
 import os
@@ -137,6 +138,7 @@ class TestSuccessfulInfer:
         last = records[-1]
         assert last.attempts == 1
         assert last.cache_hit is False
+        assert last.retry_reasons == []
 
     @pytest.mark.asyncio
     async def test_infer_decorator_wraps_correctly(self):
@@ -200,6 +202,7 @@ class TestEnsureViolationRetry:
 
         assert result.confidence == 0.95
         assert call_count == 2
+        assert all_records()[-1].retry_reasons == ["ensure condition 1 failed"]
 
     @pytest.mark.asyncio
     async def test_retry_injects_failure_context(self):
@@ -244,6 +247,42 @@ class TestEnsureViolationRetry:
         )
         assert "Previous attempt failed" in second_user_msg or "failed" in second_user_msg.lower()
 
+    @pytest.mark.asyncio
+    async def test_retry_prompt_keeps_opaque_reference_and_attachment(self):
+        """Retry block is spliced before the opaque reference; attachment is unchanged."""
+        from stratum.contracts import opaque
+
+        clear_traces()
+        captured_users = []
+
+        async def doc_fn(title: str, body: opaque[str]) -> Sentiment: ...
+
+        spec = dataclasses.replace(
+            _make_spec(doc_fn, ensure=[lambda r: r.confidence > 0.9], retries=1),
+            parameters={"title": str, "body": opaque[str]},
+        )
+        responses = [
+            _make_response({"label": "positive", "confidence": 0.3, "reasoning": "Low"}),
+            _make_response({"label": "positive", "confidence": 0.95, "reasoning": "High"}),
+        ]
+
+        async def capturing_completion(**kwargs):
+            raw = kwargs["messages"][1]["content"]
+            captured_users.append(raw[0]["text"] if isinstance(raw, list) else raw)
+            return responses[len(captured_users) - 1]
+
+        with patch("litellm.acompletion", new=capturing_completion):
+            with patch("litellm.completion_cost", return_value=0.0):
+                await execute_infer(spec, {"title": "T", "body": "secret payload"})
+
+        first, second = captured_users
+        assert "Previous attempt failed" not in first
+        retry_at = second.index("Previous attempt failed:")
+        assert retry_at < second.index("See attached data for: body")
+        assert first.endswith('Data:\n{"body": "secret payload"}')
+        assert second.endswith('Data:\n{"body": "secret payload"}')
+        assert "secret payload" not in second[:retry_at]
+
 
 # ---------------------------------------------------------------------------
 # 3. BudgetExceeded raised when cost exceeded
@@ -279,6 +318,24 @@ class TestBudgetExceeded:
                 with pytest.raises(BudgetExceeded):
                     await execute_infer(spec, {"text": "test"})
 
+    @pytest.mark.asyncio
+    async def test_cost_taken_from_response_hidden_params(self):
+        """A cost litellm already attached to the response is used without re-pricing."""
+        clear_traces()
+
+        async def priced_fn(text: str) -> Sentiment: ...
+
+        spec = _make_spec(priced_fn, budget=Budget(usd=0.001), retries=3, ensure=[lambda r: False])
+        response = _make_response({"label": "positive", "confidence": 0.5, "reasoning": ""})
+        response._hidden_params = {"response_cost": 0.005}
+
+        with patch("litellm.acompletion", new=AsyncMock(return_value=response)) as mock_llm:
+            with patch("litellm.completion_cost", side_effect=AssertionError("re-priced")):
+                with pytest.raises(BudgetExceeded):
+                    await execute_infer(spec, {"text": "test"})
+
+        assert mock_llm.call_count == 1
+
     @pytest.mark.asyncio
     async def test_timeout_budget_raises_budget_exceeded(self):
         clear_traces()
@@ -296,6 +353,24 @@ class TestBudgetExceeded:
             with pytest.raises(BudgetExceeded):
                 await execute_infer(spec, {"text": "test"})
 
+    def test_budget_deadline_expiry(self):
+        assert Budget(ms=0).is_expired()
+        assert Budget(ms=0).remaining_seconds() == 0.0
+        assert not Budget(ms=60_000).is_expired()
+        assert 0 < Budget(ms=60_000).remaining_seconds() <= 60.0
+        assert not Budget(usd=1.0).is_expired()
+        assert Budget(usd=1.0).remaining_seconds() is None
+
+    def test_budget_clone_resets_deadline(self, monkeypatch):
+        import stratum.budget as budget_mod
+
+        now = [1000.0]
+        monkeypatch.setattr(budget_mod.time, "monotonic", lambda: now[0])
+        original = Budget(ms=200)
+        now[0] += 0.25
+        assert original.is_expired()
+        assert not original.clone().is_expired()
+
 
 # ---------------------------------------------------------------------------
 # 4. PostconditionFailed raised after max retries
@@ -473,6 +548,27 @@ class TestSessionCacheScoping:
         # Exactly 2 LLM calls: one per flow execution (second call in first flow is cached)
         assert mock_llm.call_count == 2
 
+    @pytest.mark.asyncio
+    async def test_global_cache_hit_skips_llm(self):
+        """Repeated global-cache calls with identical inputs hit the LLM once."""
+        clear_traces()
+
+        async def cached_fn(text: str) -> Sentiment: ...
+
+        spec = dataclasses.replace(_make_spec(cached_fn, retries=0), cache="global")
+        mock_response = _make_response(
+            {"label": "positive", "confidence": 0.9, "reasoning": "good"}
+        )
+
+        with patch("litellm.acompletion", new=AsyncMock(return_value=mock_response)) as mock_llm:
+            with patch("litellm.completion_cost", return_value=0.0):
+                r1 = await execute_infer(spec, {"text": "global-cache"})
+                r2 = await execute_infer(spec, {"text": "global-cache"})
+
+        assert mock_llm.call_count == 1
+        assert r2 is r1
+        assert [r.cache_hit for r in all_records()] == [False, True]
+
 
 # ---------------------------------------------------------------------------
 # 7. PreconditionFailed raised immediately on given failure
@@ -646,3 +742,52 @@ class TestPromptCache:
         assert isinstance(captured["messages"][0]["content"], str)
         assert isinstance(captured["messages"][1]["content"], str)
         assert "cache_control" not in captured["tools"][0]
+
+    @pytest.mark.asyncio
+    async def test_retry_attempts_get_fresh_call_kwargs(self):
+        """A provider transform mutating one attempt's kwargs must not reach the next."""
+        clear_traces()
+        calls = []
+
+        @infer(intent="Test", model="claude-sonnet-4-6", retries=1)
+        def fn_retry(text: str) -> _CacheOut: ...
+
+        async def mutate(**kwargs):
+            calls.append(kwargs)
+            kwargs["messages"][0]["content"][0]["text"] = "mutated"
+            kwargs["tools"][0]["function"]["name"] = "mutated"
+            kwargs["tool_choice"]["function"]["name"] = "mutated"
+            if len(calls) == 1:
+                return _make_response({"wrong": 1})
+            return _make_response({"value": "ok"})
+
+        with patch("litellm.acompletion", new=mutate):
+            with patch("litellm.completion_cost", return_value=0.0):
+                await fn_retry(text="hi")
+
+        assert len(calls) == 2
+        first, second = calls
+        assert second["messages"][0] is not first["messages"][0]
+        assert second["tools"][0] is not first["tools"][0]
+        assert second["tool_choice"] is not first["tool_choice"]
+
+
+# ---------------------------------------------------------------------------
+# gen_ai.system derivation for OTel export
+# ---------------------------------------------------------------------------
+
+class TestDeriveGenAiSystem:
+    @pytest.mark.parametrize("model,expected", [
+        ("claude-sonnet-4-6", "anthropic"),
+        ("anthropic/claude-haiku-4-5", "anthropic"),
+        ("gemini/gemini-1.5-flash", "google"),
+        ("gpt-4o-mini", "openai"),
+        ("openrouter/openai/gpt-4o-mini", "openai"),
+        ("o3-mini", "openai"),
+        ("groq/llama-3.1-70b", "groq"),
+        ("llama-3.1-70b", "unknown"),
+    ])
+    def test_known_models(self, model, expected):
+        from stratum.executor import _derive_gen_ai_system
+
+        assert _derive_gen_ai_system(model) == expected
@@ -36,12 +36,11 @@ async def test_flow_scope_with_budget_clones():
 
 
 @pytest.mark.asyncio
-async def test_flow_scope_yields_uuid_string():
-    import uuid
+async def test_flow_scope_yields_hex_trace_id():
     async with FlowScope() as flow_id:
-        # must be a valid UUID string
-        parsed = uuid.UUID(flow_id)
-        assert str(parsed) == flow_id
+        # 128-bit random id, already in OTLP traceId format
+        assert len(flow_id) == 32
+        assert all(c in "0123456789abcdef" for c in flow_id)
 
 
 @pytest.mark.asyncio